@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Apply the presence.py and profiles.py fixes in one pass
+
+Each file is read once, every fix is applied to the in-memory text and the
+result is written once, instead of each fix_*.py script rereading and
+rewriting the same files.
+"""
+
+from fix_common import PRESENCE_PATH, PROFILES_PATH, buffer_output, load, save
+from fix_presence_prefix import ensure_events, fix_prefix
+from fix_presence_response import fix_response
+from fix_presence_status import fix_status
+from fix_profile_routes_order import reorder_routes
+from fix_profile_username import add_username
+
+
+def main():
+    buffer_output()
+    print("🔧 Applying presence.py fixes...\n")
+    content = load(PRESENCE_PATH)
+    for fix in (fix_prefix, ensure_events, fix_response, fix_status):
+        content = fix(content)
+    if save(PRESENCE_PATH, content):
+        print(f"\n✓ Saved {PRESENCE_PATH}")
+
+    print("\n🔧 Applying profiles.py fixes...\n")
+    content = add_username(load(PROFILES_PATH))
+    content = reorder_routes(content) or content
+    if save(PROFILES_PATH, content):
+        print(f"\n✓ Saved {PROFILES_PATH}")
+
+    print("\n✅ All fixes applied!")
+    print("\n🎯 Next steps:")
+    print("1. Run: python inspect_routes.py")
+    print("2. Restart your server")
+    print("3. Run tests again: pytest tests/ -v")
+
+
+if __name__ == "__main__":
+    main()
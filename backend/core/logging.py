@@ -1 +1,35 @@
-// Placeholder for logging.py
\ No newline at end of file
+# backend/core/logging.py
+import logging
+import uuid
+from contextvars import ContextVar
+from typing import Optional
+from fastapi import Request
+
+# Per-request logging context, stamped once by request_context_middleware
+request_id_ctx: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+client_ip_ctx: ContextVar[Optional[str]] = ContextVar("client_ip", default=None)
+
+# Log line format for handlers that carry a RequestContextFilter
+LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s %(client_ip)s] - %(message)s"
+
+
+class RequestContextFilter(logging.Filter):
+    """Attach the current request_id and client_ip to every log record."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_ctx.get()
+        record.client_ip = client_ip_ctx.get()
+        return True
+
+
+async def request_context_middleware(request: Request, call_next):
+    """
+    Stamp a correlation ID and the client IP into the logging context.
+
+    The values are deliberately not reset after the response: each request
+    runs in its own task context, and the outermost exception handlers run
+    after this middleware has returned and still need them.
+    """
+    request_id_ctx.set(str(uuid.uuid4()))
+    client_ip_ctx.set(request.client.host if request.client else None)
+    return await call_next(request)
@@ -44,6 +44,9 @@ from backend.utils.exceptions import (
     CustomHTTPException
 )
 
+# Import request-scoped logging context
+from backend.core.logging import LOG_FORMAT, RequestContextFilter, request_context_middleware
+
 # Import MQTT service
 from backend.services.mqtt import initialize_mqtt, shutdown_mqtt, mqtt_publisher
 
@@ -86,13 +89,13 @@ except ImportError as e:
         }
 
 
-# Configure logging to stdout
+# Configure logging to stdout, tagging records with the request context
+log_handler = logging.StreamHandler(sys.stdout)
+log_handler.addFilter(RequestContextFilter())
+log_handler.setFormatter(logging.Formatter(LOG_FORMAT))
 logging.basicConfig(
     level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(sys.stdout)
-    ]
+    handlers=[log_handler]
 )
 
 # Create logger for this module
@@ -321,6 +324,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request context (request_id / client_ip) for log records
+app.middleware("http")(request_context_middleware)
+
 # ==================== Custom Error Response ====================
 def create_error_response(error_code: str, message: str, details: Optional[dict] = None) -> dict:
     """Create standardized error response"""
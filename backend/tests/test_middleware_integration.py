@@ -1,6 +1,7 @@
 # backend/tests/test_middleware_integration.py
 import pytest
 import json
+import logging
 from fastapi.testclient import TestClient
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
@@ -10,7 +11,8 @@ import os
 # Add the project root to the Python path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
-from backend.main import app
+from backend.main import app, log_handler
+from backend.core.logging import RequestContextFilter, request_id_ctx, client_ip_ctx
 
 
 class TestMiddlewareIntegration:
@@ -338,4 +340,44 @@ class TestExceptionHandlerPerformance:
             assert "status_code" in data["error"]
         
         # All requests should have been handled successfully
-        assert len(responses) == len(test_endpoints)
\ No newline at end of file
+        assert len(responses) == len(test_endpoints)
+
+
+class TestRequestContextLogging:
+    """Test suite for the request-scoped logging context."""
+    
+    def test_filter_injects_request_context(self):
+        """Test that RequestContextFilter copies the context vars onto records."""
+        request_id_token = request_id_ctx.set("req-123")
+        client_ip_token = client_ip_ctx.set("10.0.0.1")
+        try:
+            record = logging.makeLogRecord({"msg": "test"})
+            assert RequestContextFilter().filter(record) is True
+            assert record.request_id == "req-123"
+            assert record.client_ip == "10.0.0.1"
+        finally:
+            request_id_ctx.reset(request_id_token)
+            client_ip_ctx.reset(client_ip_token)
+    
+    def test_filter_defaults_outside_request(self):
+        """Test that records logged outside a request get None values."""
+        record = logging.makeLogRecord({"msg": "test"})
+        RequestContextFilter().filter(record)
+        assert record.request_id is None
+        assert record.client_ip is None
+    
+    def test_log_output_includes_request_context(self):
+        """Test that the app's log handler writes request_id and client_ip into each line."""
+        request_id_token = request_id_ctx.set("req-123")
+        client_ip_token = client_ip_ctx.set("10.0.0.1")
+        try:
+            record = logging.makeLogRecord({"name": "backend.main", "levelname": "INFO", "msg": "hello"})
+            for log_filter in log_handler.filters:
+                log_filter.filter(record)
+            line = log_handler.format(record)
+        finally:
+            request_id_ctx.reset(request_id_token)
+            client_ip_ctx.reset(client_ip_token)
+        
+        assert "[req-123 10.0.0.1]" in line
+        assert line.endswith("backend.main - INFO - [req-123 10.0.0.1] - hello")
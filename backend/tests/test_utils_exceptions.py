@@ -188,6 +188,25 @@ class TestExceptionHandlerFunctions:
         # Verify logging was called
         mock_logger.warning.assert_called_once()
     
+    @pytest.mark.asyncio
+    @patch('backend.utils.exceptions.logger')
+    async def test_validation_error_handler_skips_disabled_logging(self, mock_logger):
+        """Test validation error handler skips log payload when WARNING is filtered out."""
+        mock_logger.isEnabledFor.return_value = False
+        request = self.create_mock_request(method="POST", url="http://test.com/api/test")
+        exc = Mock(spec=RequestValidationError)
+        exc.errors.return_value = [
+            {"loc": ["body", "email"], "msg": "field required", "type": "missing"}
+        ]
+        
+        response = await validation_error_handler(request, exc)
+        
+        assert response.status_code == 422
+        content = json.loads(response.body.decode())
+        assert content["error"]["details"][0]["field"] == "body.email"
+        exc.errors.assert_called_once()
+        mock_logger.warning.assert_not_called()
+    
     @pytest.mark.asyncio
     @patch('backend.utils.exceptions.logger')
     async def test_database_error_handler(self, mock_logger):
@@ -276,11 +295,12 @@ class TestExceptionHandlerFunctions:
             
             assert response.status_code == 400
             
-            # Should not crash even without client info
+            # Should not crash even without client info; the client IP is
+            # attached by RequestContextFilter rather than the handler
             mock_logger.error.assert_called_once()
             call_args = mock_logger.error.call_args
             extra = call_args[1]["extra"]
-            assert extra["client_ip"] is None
+            assert "client_ip" not in extra
 
 
 class TestExceptionHandlerEdgeCases:
@@ -1,16 +1,21 @@
 # backend/utils/exceptions.py
 import logging
-from typing import Union
+from datetime import datetime, timezone
+from typing import Callable, Optional, Union
 from fastapi import Request, HTTPException
 from fastapi.responses import JSONResponse
 from fastapi.exceptions import RequestValidationError
 from starlette.exceptions import HTTPException as StarletteHTTPException
-from pydantic import ValidationError
 
 # Configure logger for exception handling
 logger = logging.getLogger(__name__)
 
 
+def _now_iso() -> str:
+    """Return the current UTC time as an ISO 8601 string."""
+    return datetime.now(timezone.utc).isoformat()
+
+
 class CustomHTTPException(HTTPException):
     """Custom HTTP Exception with additional context."""
     
@@ -47,55 +52,105 @@ class ValidationException(Exception):
         super().__init__(self.message)
 
 
-async def http_error_handler(request: Request, exc: Union[HTTPException, StarletteHTTPException]) -> JSONResponse:
+# Logger method used for each level, looked up by name so patched loggers
+# still see the level-specific call.
+_LOG_METHODS = {
+    logging.WARNING: "warning",
+    logging.ERROR: "error",
+    logging.CRITICAL: "critical",
+}
+
+
+def _error_response(
+    request: Request,
+    *,
+    level: int,
+    label: str,
+    summary: str,
+    log_extra: Callable[[], dict],
+    status_code: int,
+    message: str,
+    error_type: str,
+    headers: Optional[dict] = None,
+    **fields
+) -> JSONResponse:
     """
-    Global HTTP error handler with logging and traceback for debugging.
+    Log an error with traceback and build the standard error response.
     
     Args:
         request: The FastAPI request object
-        exc: The HTTP exception that was raised
+        level: Logging level for the record
+        label: Short error label used as the log message prefix
+        summary: Error summary appended to the log message
+        log_extra: Returns the handler-specific ``extra`` fields; only called
+            when the record will actually be emitted
+        status_code: HTTP status code of the response
+        message: Client-facing error message
+        error_type: Value of the ``type`` field in the response
+        headers: Optional response headers
+        **fields: Additional fields for the ``error`` object
         
     Returns:
         JSONResponse with error details
     """
-    # Log the exception with traceback for better debugging
-    # Include traceback for all HTTP errors to help with debugging
-    logger.error(
-        f"HTTP {exc.status_code} error on {request.method} {request.url}: {exc.detail}",
-        exc_info=True,  # Always include traceback for debugging
-        extra={
-            "status_code": exc.status_code,
-            "method": request.method,
-            "url": str(request.url),
-            "detail": exc.detail,
-            "headers": dict(request.headers) if hasattr(request, 'headers') else {},
-            "client_ip": request.client.host if request.client else None
-        }
-    )
+    if logger.isEnabledFor(level):
+        getattr(logger, _LOG_METHODS[level])(
+            f"{label} on {request.method} {request.url}: {summary}",
+            exc_info=True,  # Always include traceback for debugging
+            extra={
+                "method": request.method,
+                "url": str(request.url),
+                **log_extra()
+            }
+        )
     
-    # Prepare error response
     error_response = {
         "error": {
-            "status_code": exc.status_code,
-            "message": exc.detail,
-            "type": "http_error",
-            "timestamp": logger.handlers[0].formatter.formatTime(logger.makeRecord(
-                name="", level=0, pathname="", lineno=0, msg="", args=(), exc_info=None
-            )) if logger.handlers else None
+            "status_code": status_code,
+            "message": message,
+            "type": error_type,
+            **fields,
+            "timestamp": _now_iso()
         }
     }
     
+    return JSONResponse(status_code=status_code, content=error_response, headers=headers)
+
+
+async def http_error_handler(request: Request, exc: Union[HTTPException, StarletteHTTPException]) -> JSONResponse:
+    """
+    Global HTTP error handler with logging and traceback for debugging.
+    
+    Args:
+        request: The FastAPI request object
+        exc: The HTTP exception that was raised
+        
+    Returns:
+        JSONResponse with error details
+    """
     # Add additional context for custom exceptions
+    fields = {}
     if isinstance(exc, CustomHTTPException):
         if exc.error_code:
-            error_response["error"]["code"] = exc.error_code
+            fields["code"] = exc.error_code
         if exc.context:
-            error_response["error"]["context"] = exc.context
+            fields["context"] = exc.context
     
-    return JSONResponse(
+    return _error_response(
+        request,
+        level=logging.ERROR,
+        label=f"HTTP {exc.status_code} error",
+        summary=exc.detail,
+        log_extra=lambda: {
+            "status_code": exc.status_code,
+            "detail": exc.detail,
+            "headers": dict(request.headers) if hasattr(request, 'headers') else {}
+        },
         status_code=exc.status_code,
-        content=error_response,
-        headers=getattr(exc, 'headers', None)
+        message=exc.detail,
+        error_type="http_error",
+        headers=getattr(exc, 'headers', None),
+        **fields
     )
 
 
@@ -110,42 +165,30 @@ async def validation_error_handler(request: Request, exc: RequestValidationError
     Returns:
         JSONResponse with validation error details
     """
-    # Log validation errors with traceback for debugging
-    logger.warning(
-        f"Validation error on {request.method} {request.url}: {len(exc.errors())} validation errors",
-        exc_info=True,  # Include traceback for debugging validation issues
-        extra={
-            "method": request.method,
-            "url": str(request.url),
-            "error_count": len(exc.errors()),
-            "errors": exc.errors(),
-            "client_ip": request.client.host if request.client else None
-        }
-    )
+    errors = exc.errors()
     
     # Format validation errors for response
-    formatted_errors = []
-    for error in exc.errors():
-        formatted_errors.append({
-            "field": ".".join(str(loc) for loc in error["loc"]),
+    formatted_errors = [
+        {
+            "field": ".".join(map(str, error["loc"])),
             "message": error["msg"],
             "type": error["type"],
             "input": error.get("input")
-        })
-    
-    error_response = {
-        "error": {
-            "status_code": 422,
-            "message": "Validation failed",
-            "type": "validation_error",
-            "details": formatted_errors,
-            "timestamp": logger.handlers[0].formatter.formatTime(logger.makeRecord(
-                name="", level=0, pathname="", lineno=0, msg="", args=(), exc_info=None
-            )) if logger.handlers else None
         }
-    }
+        for error in errors
+    ]
     
-    return JSONResponse(status_code=422, content=error_response)
+    return _error_response(
+        request,
+        level=logging.WARNING,
+        label="Validation error",
+        summary=f"{len(errors)} validation errors",
+        log_extra=lambda: {"error_count": len(errors), "errors": errors},
+        status_code=422,
+        message="Validation failed",
+        error_type="validation_error",
+        details=formatted_errors
+    )
 
 
 async def custom_database_error_handler(request: Request, exc: DatabaseException) -> JSONResponse:
@@ -159,36 +202,24 @@ async def custom_database_error_handler(request: Request, exc: DatabaseException
     Returns:
         JSONResponse with database error details
     """
-    # Log database errors with full traceback for debugging
-    logger.error(
-        f"Database error on {request.method} {request.url}: {exc.message}",
-        exc_info=True,  # Include traceback for database debugging
-        extra={
-            "method": request.method,
-            "url": str(request.url),
+    return _error_response(
+        request,
+        level=logging.ERROR,
+        label="Database error",
+        summary=exc.message,
+        log_extra=lambda: {
             "operation": exc.operation,
             "table": exc.table,
-            "message": exc.message,
-            "client_ip": request.client.host if request.client else None
-        }
+            "message": exc.message
+        },
+        status_code=500,
+        message="Database operation failed",
+        error_type="database_error",
+        details={
+            "operation": exc.operation,
+            "table": exc.table
+        } if exc.operation or exc.table else None
     )
-    
-    error_response = {
-        "error": {
-            "status_code": 500,
-            "message": "Database operation failed",
-            "type": "database_error",
-            "details": {
-                "operation": exc.operation,
-                "table": exc.table
-            } if exc.operation or exc.table else None,
-            "timestamp": logger.handlers[0].formatter.formatTime(logger.makeRecord(
-                name="", level=0, pathname="", lineno=0, msg="", args=(), exc_info=None
-            )) if logger.handlers else None
-        }
-    }
-    
-    return JSONResponse(status_code=500, content=error_response)
 
 
 async def custom_validation_error_handler(request: Request, exc: ValidationException) -> JSONResponse:
@@ -202,36 +233,24 @@ async def custom_validation_error_handler(request: Request, exc: ValidationExcep
     Returns:
         JSONResponse with validation error details
     """
-    # Log custom validation errors with traceback for debugging
-    logger.warning(
-        f"Custom validation error on {request.method} {request.url}: {exc.message}",
-        exc_info=True,  # Include traceback for validation debugging
-        extra={
-            "method": request.method,
-            "url": str(request.url),
+    return _error_response(
+        request,
+        level=logging.WARNING,
+        label="Custom validation error",
+        summary=exc.message,
+        log_extra=lambda: {
             "field": exc.field,
             "value": exc.value,
-            "message": exc.message,
-            "client_ip": request.client.host if request.client else None
-        }
+            "message": exc.message
+        },
+        status_code=400,
+        message=exc.message,
+        error_type="custom_validation_error",
+        details={
+            "field": exc.field,
+            "value": exc.value
+        } if exc.field else None
     )
-    
-    error_response = {
-        "error": {
-            "status_code": 400,
-            "message": exc.message,
-            "type": "custom_validation_error",
-            "details": {
-                "field": exc.field,
-                "value": exc.value
-            } if exc.field else None,
-            "timestamp": logger.handlers[0].formatter.formatTime(logger.makeRecord(
-                name="", level=0, pathname="", lineno=0, msg="", args=(), exc_info=None
-            )) if logger.handlers else None
-        }
-    }
-    
-    return JSONResponse(status_code=400, content=error_response)
 
 
 async def general_exception_handler(request: Request, exc: Exception) -> JSONResponse:
@@ -245,28 +264,16 @@ async def general_exception_handler(request: Request, exc: Exception) -> JSONRes
     Returns:
         JSONResponse with generic error message
     """
-    # Log unhandled exceptions as critical with full traceback
-    logger.critical(
-        f"Unhandled exception on {request.method} {request.url}: {str(exc)}",
-        exc_info=True,  # Always include full traceback for unhandled exceptions
-        extra={
-            "method": request.method,
-            "url": str(request.url),
+    return _error_response(
+        request,
+        level=logging.CRITICAL,
+        label="Unhandled exception",
+        summary=str(exc),
+        log_extra=lambda: {
             "exception_type": type(exc).__name__,
-            "exception_message": str(exc),
-            "client_ip": request.client.host if request.client else None
-        }
+            "exception_message": str(exc)
+        },
+        status_code=500,
+        message="Internal server error",
+        error_type="internal_error"
     )
-    
-    error_response = {
-        "error": {
-            "status_code": 500,
-            "message": "Internal server error",
-            "type": "internal_error",
-            "timestamp": logger.handlers[0].formatter.formatTime(logger.makeRecord(
-                name="", level=0, pathname="", lineno=0, msg="", args=(), exc_info=None
-            )) if logger.handlers else None
-        }
-    }
-    
-    return JSONResponse(status_code=500, content=error_response)
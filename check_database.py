@@ -1,5 +1,7 @@
 import sqlite3
 import os
+import sys
+from contextlib import closing
 
 db_path = 'backend/db/dev.db'
 if not os.path.exists(db_path):
@@ -7,24 +9,45 @@ if not os.path.exists(db_path):
 
 print(f"🔍 Checking database at: {db_path}\n")
 
-conn = sqlite3.connect(db_path)
-cursor = conn.cursor()
+# Open read-only so the check never takes a write lock on a live database
+with closing(sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)) as conn:
+    conn.execute("PRAGMA query_only=1")
+    conn.row_factory = sqlite3.Row
+    cursor = conn.cursor()
+    cursor.arraysize = 100
 
-# Check tables
-cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
-tables = cursor.fetchall()
-print("Tables:", [t[0] for t in tables])
+    # Check tables
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
+    tables = cursor.fetchall()
+    print("Tables:", [t["name"] for t in tables])
 
-# Check profiles table schema
-print("\n📊 Profiles table schema:")
-cursor.execute("PRAGMA table_info(profiles)")
-for col in cursor.fetchall():
-    print(f"  {col[1]} ({col[2]}) - {'NOT NULL' if col[3] else 'NULL OK'} - Default: {col[4]}")
+    # Dump the schema of every inspected table with one statement instead of
+    # a separate PRAGMA round-trip per table
+    SCHEMA_TABLES = ("profiles", "presence_events")
+    cursor.execute(
+        """
+        SELECT m.name AS table_name, p.name, p.type, p."notnull", p.dflt_value
+        FROM sqlite_master AS m
+        JOIN pragma_table_info(m.name) AS p
+        WHERE m.type = 'table' AND m.name IN (?, ?)
+        ORDER BY m.name, p.cid
+        """,
+        SCHEMA_TABLES,
+    )
+    columns = {name: [] for name in SCHEMA_TABLES}
+    while True:
+        rows = cursor.fetchmany()
+        if not rows:
+            break
+        for col in rows:
+            columns[col["table_name"]].append(col)
 
-# Check presence_events table schema
-print("\n📊 Presence_events table schema:")
-cursor.execute("PRAGMA table_info(presence_events)")
-for col in cursor.fetchall():
-    print(f"  {col[1]} ({col[2]}) - {'NOT NULL' if col[3] else 'NULL OK'} - Default: {col[4]}")
-
-conn.close()
+    # Build the whole report first and emit it with a single write
+    lines = []
+    for table_name in SCHEMA_TABLES:
+        lines.append(f"\n📊 {table_name.capitalize()} table schema:")
+        lines.extend(
+            f"  {col['name']} ({col['type']}) - {'NOT NULL' if col['notnull'] else 'NULL OK'} - Default: {col['dflt_value']}"
+            for col in columns[table_name]
+        )
+    sys.stdout.write("\n".join(lines) + "\n")
@@ -1,13 +1,11 @@
-from backend.db.base import Base
+from collections import Counter
 
-seen = set()
-duplicates = []
+from backend.db.base import Base
 
-for name in Base.metadata.tables.keys():
-    if name in seen:
-        duplicates.append(name)
-    else:
-        seen.add(name)
+# Table names are dict keys, so a real duplicate is the same table registered
+# under more than one key - count the tables' full names instead.
+table_counts = Counter(table.fullname for table in Base.metadata.tables.values())
+duplicates = [name for name, count in table_counts.items() if count > 1]
 
 if duplicates:
     print(f"⚠️ Duplicate tables found: {duplicates}")
@@ -53,6 +53,8 @@ if not user_model_found:
 Migration script to ensure all profiles have usernames
 Since users are stored in memory, we'll use the profile's user_id as username
 """
+from sqlalchemy import bindparam, update
+
 from backend.db.session import SessionLocal
 from backend.models.profile import Profile
 
@@ -60,19 +62,30 @@ def migrate_usernames():
     db = SessionLocal()
     try:
         # Get all profiles without usernames
-        profiles = db.query(Profile).filter(
+        profiles = db.query(Profile.id, Profile.user_id).filter(
             (Profile.username == None) | (Profile.username == "")
         ).all()
         
         print(f"Found {len(profiles)} profiles without usernames")
         
-        for profile in profiles:
-            # Use user_id as username if no username exists
-            # In a real system, you might want to generate a better default
-            if not profile.username:
-                # Use the first 8 characters of user_id as username
-                profile.username = f"user_{profile.user_id[:8]}"
-                print(f"Updated profile {profile.id} with username {profile.username}")
+        # Use user_id as username if no username exists
+        # In a real system, you might want to generate a better default
+        # Use the first 8 characters of user_id as username
+        updates = [
+            {"pid": profile_id, "uname": f"user_{user_id[:8]}"}
+            for profile_id, user_id in profiles
+        ]
+        for row in updates:
+            print(f"Updated profile {row['pid']} with username {row['uname']}")
+        
+        # One executemany batch instead of flushing each profile separately
+        if updates:
+            db.execute(
+                update(Profile.__table__)
+                .where(Profile.__table__.c.id == bindparam("pid"))
+                .values(username=bindparam("uname")),
+                updates
+            )
         
         db.commit()
         print("✓ Migration complete!")
@@ -104,9 +117,10 @@ print("\n🔧 Fixing presence route imports...")
 with open('backend/routes/presence.py', 'r') as f:
     presence_content = f.read()
 
-# Remove or comment out User import
+# Remove or comment out User import (an import already guarded by
+# try/except ImportError is left alone; commenting it out would empty the try)
 presence_content = re.sub(
-    r'from backend\.models\.user import User',
+    r'(?<!try:\n    )from backend\.models\.user import User',
     '# from backend.models.user import User  # Users are in memory, not in DB',
     presence_content
 )
@@ -2,42 +2,47 @@
 """
 Debug the presence event response
 """
-import requests
+import asyncio
 import json
 
-# Quick test of the presence endpoint
-BASE_URL = "http://localhost:8000"
+from presient_debug import get_session, run
 
 # First, get a token
 register_data = {
     "username": "debug_user_123",
     "email": "debug@test.com",
-    "password": "TestPass123",
-    "full_name": "Debug User"
+    "password": "TestPass123"
+}
+
+# Quick test of the presence endpoint
+event_data = {
+    "user_id": "debug_user_123",
+    "sensor_id": "test-sensor-01",
+    "confidence": 0.95
 }
 
-response = requests.post(f"{BASE_URL}/api/auth/register", json=register_data)
-if response.status_code == 201:
-    token = response.json()["access_token"]
-    headers = {"Authorization": f"Bearer {token}"}
+async def main():
+    session = get_session()
     
-    # Test presence event
-    event_data = {
-        "user_id": "debug_user_123",
-        "sensor_id": "test-sensor-01",
-        "confidence": 0.95
-    }
+    async with session.post("/api/auth/register", json=register_data) as response:
+        if response.status != 201:
+            print(f"Registration failed: {response.status}")
+            return
+        token = (await response.json())["access_token"]
+    
+    auth_headers = {"Authorization": f"Bearer {token}"}
     
-    response = requests.post(f"{BASE_URL}/api/presence/event", json=event_data, headers=headers)
-    print(f"Status: {response.status_code}")
-    print(f"Headers: {dict(response.headers)}")
-    print(f"Content-Type: {response.headers.get('content-type')}")
-    print(f"Raw content: {response.content}")
-    print(f"Response text: {response.text}")
+    # Test presence event
+    async with session.post("/api/presence/event", json=event_data, headers=auth_headers) as response:
+        content = await response.read()
+        print(f"Status: {response.status}")
+        print(f"Headers: {dict(response.headers)}")
+        print(f"Content-Type: {response.headers.get('content-type')}")
+        print(f"Raw content: {content[:512]}")
     
-    # Try to parse
+    # Parse the bytes we already have instead of decoding the body again
     try:
-        data = response.json()
+        data = json.loads(content)
         print(f"\nParsed JSON type: {type(data)}")
         print(f"Parsed JSON: {data}")
         
@@ -48,5 +53,6 @@ if response.status_code == 201:
             print(f"Double-parsed: {data}")
     except Exception as e:
         print(f"\nError parsing JSON: {e}")
-else:
-    print(f"Registration failed: {response.status_code}")
+
+if __name__ == "__main__":
+    asyncio.run(run(main()))
@@ -3,66 +3,69 @@
 Diagnose and fix 500 errors in the API
 """
 
-import requests
+import asyncio
 import json
 import sqlite3
 import os
+import sys
+from contextlib import closing
 from datetime import datetime
+from itertools import groupby
+from operator import itemgetter
 
-BASE_URL = "http://localhost:8000"
+from presient_debug import breaker, get_session, run
+
+def _is_json(response):
+    """True for application/json responses, with or without a charset parameter"""
+    return response.content_type == 'application/json'
 
 def check_database_schema():
     """Check database schema for issues"""
-    print("\n🔍 Checking database schema...")
+    # Collect the report and emit it with a single write
+    out = ["\n🔍 Checking database schema...\n"]
     
     db_path = "backend/db/dev.db"
     if not os.path.exists(db_path):
         db_path = "presient.db"
     
     if not os.path.exists(db_path):
-        print("❌ No database found!")
+        out.append("❌ No database found!\n")
+        sys.stdout.writelines(out)
         return False
     
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    
-    # Check tables
-    cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
-    tables = [t[0] for t in cursor.fetchall()]
-    print(f"✓ Found tables: {tables}")
-    
-    # Check users table schema
-    if "users" in tables:
-        cursor.execute("PRAGMA table_info(users)")
-        columns = cursor.fetchall()
-        print("\n📊 Users table schema:")
-        for col in columns:
-            print(f"  - {col[1]} ({col[2]})")
-    else:
-        print("❌ Users table not found!")
-    
-    # Check profiles table schema
-    if "profiles" in tables:
-        cursor.execute("PRAGMA table_info(profiles)")
-        columns = cursor.fetchall()
-        print("\n📊 Profiles table schema:")
-        for col in columns:
-            print(f"  - {col[1]} ({col[2]})")
-    
-    # Check presence_events table schema
-    if "presence_events" in tables:
-        cursor.execute("PRAGMA table_info(presence_events)")
-        columns = cursor.fetchall()
-        print("\n📊 Presence_events table schema:")
-        for col in columns:
-            print(f"  - {col[1]} ({col[2]})")
-    
-    conn.close()
+    # Read-only and query_only so the diagnostic never contends with the running API
+    with closing(sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, isolation_level=None)) as conn:
+        conn.execute("PRAGMA query_only=1")
+        cursor = conn.cursor()
+    
+        # Check tables
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
+        tables = [t[0] for t in cursor.fetchall()]
+        out.append(f"✓ Found tables: {tables}\n")
+    
+        if "users" not in tables:
+            out.append("❌ Users table not found!\n")
+    
+        # Fetch the schema of every inspected table in a single query
+        cursor.execute("""
+            SELECT m.name AS table_name, p.name, p.type
+            FROM sqlite_master AS m
+            JOIN pragma_table_info(m.name) AS p
+            WHERE m.type = 'table' AND m.name IN ('users', 'profiles', 'presence_events')
+            ORDER BY CASE m.name WHEN 'users' THEN 0 WHEN 'profiles' THEN 1 ELSE 2 END, p.cid
+        """)
+        for table_name, columns in groupby(cursor.fetchall(), key=itemgetter(0)):
+            out.append(f"\n📊 {table_name.capitalize()} table schema:\n")
+            for _, name, col_type in columns:
+                out.append(f"  - {name} ({col_type})\n")
+    
+    sys.stdout.writelines(out)
     return True
 
-def test_with_details():
+async def test_with_details(session):
     """Test endpoints and capture detailed error information"""
-    print("\n🧪 Testing endpoints with detailed error capture...\n")
+    # Each step's output is collected and written in one go
+    sys.stdout.write("\n🧪 Testing endpoints with detailed error capture...\n\n")
     
     # First, register a user
     timestamp = int(datetime.now().timestamp())
@@ -71,60 +74,77 @@ def test_with_details():
     register_data = {
         "username": username,
         "email": f"{username}@test.com",
-        "password": "TestPassword123",
-        "full_name": "Debug User"
+        "password": "TestPassword123"
     }
     
-    print("1️⃣ Testing Registration...")
-    response = requests.post(f"{BASE_URL}/api/auth/register", json=register_data)
-    print(f"   Status: {response.status_code}")
+    out = ["1️⃣ Testing Registration...\n"]
+    async with await breaker(session.post, "/api/auth/register", json=register_data) as response:
+        out.append(f"   Status: {response.status}\n")
+        
+        if response.status != 201:
+            out.append(f"   ❌ Registration failed: {await response.text()}\n")
+            sys.stdout.writelines(out)
+            return
+        
+        auth_data = await response.json()
     
-    if response.status_code != 201:
-        print(f"   ❌ Registration failed: {response.text}")
-        return
-    
-    auth_data = response.json()
     token = auth_data.get("access_token")
     user_id = auth_data.get("user_id")
-    print(f"   ✓ Token received: {token[:30]}...")
-    print(f"   ✓ User ID: {user_id}")
-    
-    headers = {"Authorization": f"Bearer {token}"}
-    
-    # Test profile endpoint
-    print("\n2️⃣ Testing GET /api/profiles/me...")
-    response = requests.get(f"{BASE_URL}/api/profiles/me", headers=headers)
-    print(f"   Status: {response.status_code}")
-    
-    if response.status_code == 500:
-        print(f"   ❌ Server Error: {response.text}")
-        # Try to get more details
-        error_data = response.json() if response.headers.get('content-type') == 'application/json' else {}
-        if "detail" in error_data:
-            print(f"   Error details: {json.dumps(error_data['detail'], indent=2)}")
-    elif response.status_code == 200:
-        print(f"   ✓ Profile retrieved successfully")
-        profile = response.json()
-        print(f"   Profile ID: {profile.get('id')}")
-    
-    # Test presence event creation
-    print("\n3️⃣ Testing POST /api/presence/event...")
+    out.append(f"   ✓ Token received: {token[:30]}...\n")
+    out.append(f"   ✓ User ID: {user_id}\n")
+    sys.stdout.writelines(out)
+    
+    auth_headers = {"Authorization": f"Bearer {token}"}
+    
+    # The profile and event checks only need the token, so send them together
+    # and print each step's output once both have finished
+    outputs = await asyncio.gather(
+        _test_profile(session, auth_headers),
+        _test_presence_event(session, user_id, auth_headers)
+    )
+    for out in outputs:
+        sys.stdout.writelines(out)
+
+async def _test_profile(session, auth_headers):
+    """Test GET /api/profiles/me and return the step's output"""
+    out = ["\n2️⃣ Testing GET /api/profiles/me...\n"]
+    async with await breaker(session.get, "/api/profiles/me", headers=auth_headers) as response:
+        out.append(f"   Status: {response.status}\n")
+        
+        if response.status == 500:
+            # Read the body once and parse the same bytes for details
+            body = await response.read()
+            out.append(f"   ❌ Server Error: {body[:512]}\n")
+            error_data = json.loads(body) if _is_json(response) else {}
+            if "detail" in error_data:
+                out.append(f"   Error details: {json.dumps(error_data['detail'], indent=2)}\n")
+        elif response.status == 200:
+            out.append(f"   ✓ Profile retrieved successfully\n")
+            profile = await response.json()
+            out.append(f"   Profile ID: {profile.get('id')}\n")
+    return out
+
+async def _test_presence_event(session, user_id, auth_headers):
+    """Test POST /api/presence/event and return the step's output"""
+    out = ["\n3️⃣ Testing POST /api/presence/event...\n"]
     event_data = {
         "user_id": user_id,
         "sensor_id": "debug-sensor-001",
         "confidence": 0.85
     }
     
-    response = requests.post(f"{BASE_URL}/api/presence/event", json=event_data, headers=headers)
-    print(f"   Status: {response.status_code}")
-    
-    if response.status_code == 500:
-        print(f"   ❌ Server Error: {response.text}")
-        error_data = response.json() if response.headers.get('content-type') == 'application/json' else {}
-        if "detail" in error_data:
-            print(f"   Error details: {json.dumps(error_data['detail'], indent=2)}")
-    elif response.status_code == 200:
-        print(f"   ✓ Event created successfully")
+    async with await breaker(session.post, "/api/presence/event", json=event_data, headers=auth_headers) as response:
+        out.append(f"   Status: {response.status}\n")
+        
+        if response.status == 500:
+            body = await response.read()
+            out.append(f"   ❌ Server Error: {body[:512]}\n")
+            error_data = json.loads(body) if _is_json(response) else {}
+            if "detail" in error_data:
+                out.append(f"   Error details: {json.dumps(error_data['detail'], indent=2)}\n")
+        elif response.status == 200:
+            out.append(f"   ✓ Event created successfully\n")
+    return out
 
 def check_model_issues():
     """Check for common model issues"""
@@ -170,6 +190,15 @@ Fix common issues causing 500 errors
 import os
 import re
 
+# Primary key columns that are missing a UUID default
+_UUID_PAT = re.compile(r'id = Column\\(String, primary_key=True\\)')
+_UUID_REPL = 'id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))'
+
+def _add_uuid_defaults(content):
+    """Add the uuid import if needed and give String primary keys a UUID default"""
+    prefix = "" if "import uuid" in content else "import uuid\\n"
+    return prefix + _UUID_PAT.sub(_UUID_REPL, content)
+
 def fix_profile_model():
     """Fix profile model issues"""
     print("Fixing profile model...")
@@ -177,19 +206,8 @@ def fix_profile_model():
     with open("backend/models/profile.py", "r") as f:
         content = f.read()
     
-    # Fix imports
-    if "import uuid" not in content:
-        content = "import uuid\\n" + content
-    
-    # Fix UUID defaults
-    content = re.sub(
-        r'id = Column\\(String, primary_key=True\\)',
-        'id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))',
-        content
-    )
-    
-    # Fix relationship name
-    content = content.replace("PresenceEvents", "PresenceEvent")
+    # Fix imports, UUID defaults and the relationship name
+    content = _add_uuid_defaults(content).replace("PresenceEvents", "PresenceEvent")
     
     with open("backend/models/profile.py", "w") as f:
         f.write(content)
@@ -203,16 +221,8 @@ def fix_presence_model():
     with open("backend/models/presence_events.py", "r") as f:
         content = f.read()
     
-    # Fix imports
-    if "import uuid" not in content:
-        content = "import uuid\\n" + content
-    
-    # Fix UUID defaults
-    content = re.sub(
-        r'id = Column\\(String, primary_key=True\\)',
-        'id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))',
-        content
-    )
+    # Fix imports and UUID defaults
+    content = _add_uuid_defaults(content)
     
     with open("backend/models/presence_events.py", "w") as f:
         f.write(content)
@@ -257,7 +267,7 @@ if __name__ == "__main__":
     print("✓ Created fix_500_errors.py")
     print("\nRun: python fix_500_errors.py")
 
-def main():
+async def main():
     print("🔍 DIAGNOSING 500 ERRORS IN PRESIENT API")
     print("=" * 50)
     
@@ -265,7 +275,7 @@ def main():
     check_database_schema()
     
     # Test endpoints with detailed error capture
-    test_with_details()
+    await test_with_details(get_session())
     
     # Check for model issues
     check_model_issues()
@@ -282,4 +292,4 @@ def main():
     print("\nCheck the server terminal for detailed error logs!")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    asyncio.run(run(main()))
\ No newline at end of file
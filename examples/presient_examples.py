@@ -5,30 +5,120 @@ Demonstrates various use cases for the PresientDB time-series database
 """
 
 import json
+import os
+import socket
+import threading
 import time
 import random
+from collections import deque
 from datetime import datetime, timedelta, timezone
+import numpy as np
 import paho.mqtt.client as mqtt
+from paho.mqtt import publish as mqtt_publish
 
 # MQTT Configuration
-MQTT_BROKER = "localhost"  # Change to "mosquitto" if running in Docker
+MQTT_BROKER = "localhost"
+DOCKER_BROKER = "mosquitto"  # Docker service name, tried when MQTT_BROKER refuses
 MQTT_PORT = 1883
 BASE_TOPIC = "presient"
 
-# Try to detect if we should use Docker hostname
-import socket
+# Topics are formatted once here rather than at every publish
+RESPONSE_TOPICS = f"{BASE_TOPIC}/response/#"
+BATCH_TOPIC = f"{BASE_TOPIC}/write/batch"
+QUERY_TIME_RANGE_TOPIC = f"{BASE_TOPIC}/query/time-range"
+QUERY_AGGREGATE_TOPIC = f"{BASE_TOPIC}/query/aggregate"
+EXPORT_TOPIC = f"{BASE_TOPIC}/export/request"
+TEMPERATURE_TOPICS = f"{BASE_TOPIC}/data/sensors/+/temperature"
+ALERT_BATCH_TOPIC = f"{BASE_TOPIC}/alerts/temperature/batch"
+
+# Set PRESIENT_BATCH_TOPIC=0 for servers without write/batch ingestion
+BATCH_TOPIC_ENABLED = os.environ.get("PRESIENT_BATCH_TOPIC", "1") != "0"
+
+# Monitoring alerts are queued and published in batches off the MQTT thread
+ALERT_FLUSH_INTERVAL = 0.1
+ALERT_BATCH_SIZE = 64
+
+# How long to wait for the broker to acknowledge a QoS 1 publish
+PUBLISH_TIMEOUT = 2
+
+# How long to wait for PresientDB to answer a query or export request
+RESPONSE_TIMEOUT = 10
+
+# Telemetry examples can send MessagePack instead of JSON when the
+# subscriber understands it; topics are the same either way
+TELEMETRY_FORMAT = os.environ.get("PRESIENT_TELEMETRY_FORMAT", "json")
+
 try:
-    # Test connection to localhost
-    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    sock.settimeout(1)
-    result = sock.connect_ex(('localhost', MQTT_PORT))
-    sock.close()
-    if result != 0:
-        # If localhost fails, try Docker service name
-        MQTT_BROKER = "mosquitto"
-        print(f"ℹ️  Using Docker hostname: {MQTT_BROKER}")
-except:
-    pass
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+def encode_payload(data):
+    """Serialize an MQTT payload as compact JSON"""
+    return json.dumps(data, separators=(",", ":"))
+
+def encode_telemetry(data):
+    """Serialize a sensor/batch payload in TELEMETRY_FORMAT"""
+    if TELEMETRY_FORMAT == "msgpack":
+        if msgpack is None:
+            raise RuntimeError("PRESIENT_TELEMETRY_FORMAT=msgpack needs: pip install msgpack")
+        return msgpack.packb(data, use_bin_type=True)
+    return encode_payload(data)
+
+def decode_telemetry(payload):
+    """Deserialize a payload written by encode_telemetry"""
+    if TELEMETRY_FORMAT == "msgpack":
+        if msgpack is None:
+            raise RuntimeError("PRESIENT_TELEMETRY_FORMAT=msgpack needs: pip install msgpack")
+        return msgpack.unpackb(payload, raw=False)
+    return json.loads(payload)
+
+# Query and export requests only differ in their time range, so each one is
+# serialized once with placeholders that are filled in per request
+TIME_RANGE = {"start": "__START__", "end": "__END__"}
+
+QUERY_LAST_HOUR = encode_payload({
+    "measurement": "environmental",
+    "fields": ["temperature", "humidity"],
+    "tags": {"location": "living-room"},
+    "time_range": TIME_RANGE
+}).encode()
+
+QUERY_HOURLY_MEAN = encode_payload({
+    "measurement": "environmental",
+    "fields": ["temperature"],
+    "aggregation": {
+        "function": "mean",
+        "interval": "1h",
+        "group_by": ["location"]
+    },
+    "time_range": TIME_RANGE
+}).encode()
+
+EXPORT_WEEKLY_CSV = encode_payload({
+    "format": "csv",
+    "measurement": "environmental",
+    "fields": ["temperature", "humidity"],
+    "time_range": TIME_RANGE,
+    "output": "weekly_environmental_data.csv"
+}).encode()
+
+EXPORT_MONTHLY_JSON = encode_payload({
+    "format": "json",
+    "measurement": "power_usage",
+    "fields": ["power"],
+    "aggregation": {
+        "function": "mean",
+        "interval": "1d"
+    },
+    "time_range": TIME_RANGE,
+    "output": "monthly_power_average.json"
+}).encode()
+
+def fill_time_range(template, start, end):
+    """Splice ISO start/end timestamps into a pre-serialized request"""
+    return template.replace(b"__START__", start.encode()).replace(b"__END__", end.encode())
 
 class PresientExample:
     """Base class for PresientDB examples"""
@@ -39,13 +129,20 @@ class PresientExample:
         self.client.on_connect = self.on_connect
         self.client.on_message = self.on_message
         self.client.on_publish = self.on_publish
+        # Let bursts of QoS 1 publishes go out without waiting on paho's
+        # default window of 20 unacknowledged messages
+        self.client.max_inflight_messages_set(1000)
+        self.client.max_queued_messages_set(0)
+        self.broker = MQTT_BROKER
+        # Set by on_message when a reply arrives on RESPONSE_TOPICS
+        self.response_received = threading.Event()
         
     def on_connect(self, client, userdata, flags, rc, properties=None):
         """Callback for when the client connects to the broker"""
         if rc == 0:
-            print(f"✓ Connected to MQTT broker at {MQTT_BROKER}:{MQTT_PORT}")
+            print(f"✓ Connected to MQTT broker at {self.broker}:{MQTT_PORT}")
             # Subscribe to response topics
-            client.subscribe(f"{BASE_TOPIC}/response/#")
+            client.subscribe(RESPONSE_TOPICS)
         else:
             print(f"✗ Failed to connect, return code {rc}")
     
@@ -53,24 +150,51 @@ class PresientExample:
         """Callback for when a message is received"""
         print(f"📩 Received: {msg.topic}")
         try:
-            payload = json.loads(msg.payload.decode())
+            payload = decode_telemetry(msg.payload)
             print(f"   Data: {json.dumps(payload, indent=2)}")
         except:
             print(f"   Data: {msg.payload.decode()}")
+        self.response_received.set()
     
     def on_publish(self, client, userdata, mid, reason_code=None, properties=None):
         """Callback for when a message is published"""
         print(f"📤 Message {mid} published successfully")
     
+    def publish(self, topic, payload):
+        """Publish with QoS 1 and return the MQTTMessageInfo to wait on"""
+        return self.client.publish(topic, payload, qos=1)
+    
+    def wait_for_publish(self, *infos):
+        """Block until the broker has acknowledged each publish, instead of sleeping"""
+        for info in infos:
+            try:
+                info.wait_for_publish(PUBLISH_TIMEOUT)
+            except (RuntimeError, ValueError) as e:
+                print(f"❌ Message {info.mid} was not published: {e}")
+    
+    def request(self, topic, payload):
+        """Publish a request and block until its reply arrives or RESPONSE_TIMEOUT passes"""
+        self.response_received.clear()
+        self.wait_for_publish(self.publish(topic, payload))
+        if not self.response_received.wait(RESPONSE_TIMEOUT):
+            print(f"❌ No response to {topic} within {RESPONSE_TIMEOUT}s")
+    
     def connect(self):
-        """Connect to the MQTT broker"""
+        """Connect to the MQTT broker, falling back to the Docker hostname"""
         try:
-            self.client.connect(MQTT_BROKER, MQTT_PORT, 60)
+            try:
+                self.client.connect(MQTT_BROKER, MQTT_PORT, 60)
+            except OSError:
+                self.broker = DOCKER_BROKER
+                print(f"ℹ️  Using Docker hostname: {self.broker}")
+                self.client.connect(self.broker, MQTT_PORT, 60)
+            # MQTT frames here are small; send them without Nagle delays
+            self.client.socket().setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
             self.client.loop_start()
             time.sleep(1)  # Give it time to connect
         except Exception as e:
             print(f"❌ Connection failed: {e}")
-            print(f"   Make sure the MQTT broker is running on {MQTT_BROKER}:{MQTT_PORT}")
+            print(f"   Make sure the MQTT broker is running on {self.broker}:{MQTT_PORT}")
             raise
 
 # Example 1: Basic Sensor Data Ingestion
@@ -85,36 +209,41 @@ def example_sensor_data():
     sensor_id = "temp-sensor-01"
     location = "living-room"
     
-    print(f"\n📊 Sending temperature data for {sensor_id}")
+    print(f"\n📊 Reading temperature data for {sensor_id}")
     
+    # Buffer the readings and send them as one columnar batch message, with
+    # the measurement and tags written once
+    timestamps, temperatures, humidities = [], [], []
     for i in range(5):
         # Generate realistic temperature data
         temperature = 20 + random.uniform(-2, 2)
         humidity = 50 + random.uniform(-10, 10)
         
-        # Create the data point
-        data_point = {
-            "measurement": "environmental",
-            "tags": {
-                "sensor_id": sensor_id,
-                "location": location,
-                "type": "DHT22"
-            },
-            "fields": {
-                "temperature": round(temperature, 2),
-                "humidity": round(humidity, 2)
-            },
-            "timestamp": datetime.now(timezone.utc).isoformat()
-        }
-        
-        # Publish to PresientDB
-        topic = f"{BASE_TOPIC}/write/sensors/{sensor_id}"
-        example.client.publish(topic, json.dumps(data_point))
+        timestamps.append(int(time.time() * 1000))
+        temperatures.append(round(temperature, 2))
+        humidities.append(round(humidity, 2))
         
-        print(f"   Sent: temp={temperature:.2f}°C, humidity={humidity:.2f}%")
+        print(f"   Read: temp={temperature:.2f}°C, humidity={humidity:.2f}%")
         time.sleep(2)
     
-    time.sleep(2)
+    batch_message = {
+        "measurement": "environmental",
+        "tags": {
+            "sensor_id": sensor_id,
+            "location": location,
+            "type": "DHT22"
+        },
+        "precision": "ms",
+        "timestamps": timestamps,
+        "temperature": temperatures,
+        "humidity": humidities
+    }
+    
+    # Publish to PresientDB
+    topic = BATCH_TOPIC
+    example.wait_for_publish(example.publish(topic, encode_telemetry(batch_message)))
+    print(f"   Sent batch of {len(timestamps)} readings")
+    
     example.client.loop_stop()
     example.client.disconnect()
 
@@ -126,41 +255,23 @@ def example_time_queries():
     example = PresientExample("query-example")
     example.connect()
     
+    # Both queries share one reference time
+    now = datetime.now(timezone.utc)
+    now_iso = now.isoformat()
+    
     # Query 1: Get last hour of data
     print("\n🔍 Query 1: Last hour of temperature data")
-    query1 = {
-        "measurement": "environmental",
-        "fields": ["temperature", "humidity"],
-        "tags": {"location": "living-room"},
-        "time_range": {
-            "start": (datetime.now(timezone.utc) - timedelta(hours=1)).isoformat(),
-            "end": datetime.now(timezone.utc).isoformat()
-        }
-    }
+    query1 = fill_time_range(QUERY_LAST_HOUR, (now - timedelta(hours=1)).isoformat(), now_iso)
     
-    topic = f"{BASE_TOPIC}/query/time-range"
-    example.client.publish(topic, json.dumps(query1))
-    time.sleep(2)
+    topic = QUERY_TIME_RANGE_TOPIC
+    example.request(topic, query1)
     
     # Query 2: Get data with aggregation
     print("\n🔍 Query 2: Average temperature by hour")
-    query2 = {
-        "measurement": "environmental",
-        "fields": ["temperature"],
-        "aggregation": {
-            "function": "mean",
-            "interval": "1h",
-            "group_by": ["location"]
-        },
-        "time_range": {
-            "start": (datetime.now(timezone.utc) - timedelta(days=1)).isoformat(),
-            "end": datetime.now(timezone.utc).isoformat()
-        }
-    }
+    query2 = fill_time_range(QUERY_HOURLY_MEAN, (now - timedelta(days=1)).isoformat(), now_iso)
     
-    topic = f"{BASE_TOPIC}/query/aggregate"
-    example.client.publish(topic, json.dumps(query2))
-    time.sleep(2)
+    topic = QUERY_AGGREGATE_TOPIC
+    example.request(topic, query2)
     
     example.client.loop_stop()
     example.client.disconnect()
@@ -175,37 +286,56 @@ def example_batch_import():
     
     print("\n📦 Importing historical data batch")
     
-    # Generate batch of historical data
-    batch_data = []
-    base_time = datetime.now(timezone.utc) - timedelta(hours=24)
-    
-    for i in range(50):
-        timestamp = base_time + timedelta(minutes=i*30)
-        batch_data.append({
-            "measurement": "power_usage",
-            "tags": {
-                "meter_id": "main-meter",
-                "building": "office-a"
-            },
-            "fields": {
-                "voltage": 230 + random.uniform(-5, 5),
-                "current": 10 + random.uniform(-2, 2),
-                "power": 2300 + random.uniform(-200, 200)
-            },
-            "timestamp": timestamp.isoformat()
-        })
-    
-    # Send batch
-    batch_message = {
-        "points": batch_data,
-        "precision": "ms"
+    # Generate batch of historical data in columnar form: measurement and
+    # tags are sent once, then one array per field with epoch-ms timestamps
+    points = 50
+    rng = np.random.default_rng()
+    base_ms = int((datetime.now(timezone.utc) - timedelta(hours=24)).timestamp() * 1000)
+    timestamps = base_ms + np.arange(points, dtype=np.int64) * 30 * 60 * 1000
+    voltage = 230 + rng.uniform(-5, 5, points)
+    current = 10 + rng.uniform(-2, 2, points)
+    power = 2300 + rng.uniform(-200, 200, points)
+    
+    tags = {
+        "meter_id": "main-meter",
+        "building": "office-a"
     }
     
-    topic = f"{BASE_TOPIC}/write/batch"
-    example.client.publish(topic, json.dumps(batch_message))
-    print(f"   Sent batch of {len(batch_data)} data points")
+    if BATCH_TOPIC_ENABLED:
+        # Send batch
+        batch_message = {
+            "measurement": "power_usage",
+            "tags": tags,
+            "precision": "ms",
+            "timestamps": timestamps.tolist(),
+            "voltage": voltage.tolist(),
+            "current": current.tolist(),
+            "power": power.tolist()
+        }
+        
+        topic = BATCH_TOPIC
+        example.wait_for_publish(example.publish(topic, encode_telemetry(batch_message)))
+        print(f"   Sent batch of {points} data points")
+    else:
+        # One message per point, all sent over a single connection
+        topic = f"{BASE_TOPIC}/write/sensors/{tags['meter_id']}"
+        messages = [
+            {
+                "topic": topic,
+                "payload": encode_telemetry({
+                    "measurement": "power_usage",
+                    "tags": tags,
+                    "fields": {"voltage": v, "current": c, "power": p},
+                    "precision": "ms",
+                    "timestamp": ts
+                }),
+                "qos": 1
+            }
+            for ts, v, c, p in zip(timestamps.tolist(), voltage.tolist(), current.tolist(), power.tolist())
+        ]
+        mqtt_publish.multiple(messages, hostname=example.broker, port=MQTT_PORT, client_id="batch-example-points")
+        print(f"   Sent {points} data points individually")
     
-    time.sleep(2)
     example.client.loop_stop()
     example.client.disconnect()
 
@@ -217,39 +347,65 @@ def example_realtime_monitor():
     class MonitoringExample(PresientExample):
         def __init__(self):
             super().__init__("monitor-example")
+            # Reconnect quickly if the broker drops the long-lived subscriber
+            self.client.reconnect_delay_set(min_delay=1, max_delay=8)
             self.threshold_temp = 25.0
             self.alert_count = 0
+            # on_message runs on the client's network thread, so it only queues
+            # alerts and this thread publishes them
+            self._alerts = deque(maxlen=1024)
+            self._stopped = threading.Event()
+            self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+            self._flusher.start()
+        
+        def _flush_loop(self):
+            """Publish queued alerts every ALERT_FLUSH_INTERVAL until stopped"""
+            while not self._stopped.wait(ALERT_FLUSH_INTERVAL):
+                self._flush_alerts()
+            self._flush_alerts()
+        
+        def _flush_alerts(self):
+            """Drain the queue in messages of up to ALERT_BATCH_SIZE alerts"""
+            while self._alerts:
+                batch = [self._alerts.popleft() for _ in range(min(ALERT_BATCH_SIZE, len(self._alerts)))]
+                self.client.publish(ALERT_BATCH_TOPIC, encode_payload({"alerts": batch}))
+        
+        def stop(self):
+            """Stop the flusher after publishing any alerts still queued"""
+            self._stopped.set()
+            self._flusher.join()
         
         def on_connect(self, client, userdata, flags, rc, properties=None):
             super().on_connect(client, userdata, flags, rc, properties)
             # Subscribe to sensor data
-            client.subscribe(f"{BASE_TOPIC}/data/sensors/+/temperature")
+            client.subscribe(TEMPERATURE_TOPICS)
             print(f"📡 Monitoring temperature (threshold: {self.threshold_temp}°C)")
         
         def on_message(self, client, userdata, msg):
             """Check for threshold violations"""
+            threshold = self.threshold_temp
             try:
-                data = json.loads(msg.payload.decode())
-                temp = data.get('fields', {}).get('temperature', 0)
+                data = decode_telemetry(msg.payload)
+                # Well-formed readings are the common case, so index directly
+                temp = data['fields']['temperature']
+            except (KeyError, TypeError, ValueError) as e:
+                print(f"Error processing message: {e!r}")
+                return
+            
+            if temp > threshold:
+                self.alert_count += 1
+                print(f"⚠️  ALERT: Temperature {temp}°C exceeds threshold!")
                 
-                if temp > self.threshold_temp:
-                    self.alert_count += 1
-                    print(f"⚠️  ALERT: Temperature {temp}°C exceeds threshold!")
-                    
-                    # Send alert
-                    alert = {
-                        "alert_type": "temperature_high",
-                        "sensor": data.get('tags', {}).get('sensor_id', 'unknown'),
-                        "value": temp,
-                        "threshold": self.threshold_temp,
-                        "timestamp": datetime.now(timezone.utc).isoformat()
-                    }
-                    client.publish(f"{BASE_TOPIC}/alerts/temperature", json.dumps(alert))
-                else:
-                    print(f"✓ Temperature normal: {temp}°C")
-                    
-            except Exception as e:
-                print(f"Error processing message: {e}")
+                # Queue alert for the next batch
+                self._alerts.append({
+                    "alert_type": "temperature_high",
+                    "sensor": data.get('tags', {}).get('sensor_id', 'unknown'),
+                    "value": temp,
+                    "threshold": threshold,
+                    "timestamp": datetime.now(timezone.utc).isoformat()
+                })
+            else:
+                print(f"✓ Temperature normal: {temp}°C")
     
     monitor = MonitoringExample()
     monitor.connect()
@@ -261,6 +417,7 @@ def example_realtime_monitor():
         print("\n👋 Stopping monitor...")
     
     print(f"\n📊 Total alerts: {monitor.alert_count}")
+    monitor.stop()
     monitor.client.loop_stop()
     monitor.client.disconnect()
 
@@ -272,42 +429,22 @@ def example_data_export():
     example = PresientExample("export-example")
     example.connect()
     
+    # Both exports share one reference time
+    now = datetime.now(timezone.utc)
+    now_iso = now.isoformat()
+    
     # Export to CSV
     print("\n📄 Requesting CSV export")
-    export_request = {
-        "format": "csv",
-        "measurement": "environmental",
-        "fields": ["temperature", "humidity"],
-        "time_range": {
-            "start": (datetime.now(timezone.utc) - timedelta(days=7)).isoformat(),
-            "end": datetime.now(timezone.utc).isoformat()
-        },
-        "output": "weekly_environmental_data.csv"
-    }
+    export_request = fill_time_range(EXPORT_WEEKLY_CSV, (now - timedelta(days=7)).isoformat(), now_iso)
     
-    topic = f"{BASE_TOPIC}/export/request"
-    example.client.publish(topic, json.dumps(export_request))
-    time.sleep(2)
+    topic = EXPORT_TOPIC
+    example.request(topic, export_request)
     
     # Export to JSON with aggregation
     print("\n📄 Requesting JSON export with daily averages")
-    export_request2 = {
-        "format": "json",
-        "measurement": "power_usage",
-        "fields": ["power"],
-        "aggregation": {
-            "function": "mean",
-            "interval": "1d"
-        },
-        "time_range": {
-            "start": (datetime.now(timezone.utc) - timedelta(days=30)).isoformat(),
-            "end": datetime.now(timezone.utc).isoformat()
-        },
-        "output": "monthly_power_average.json"
-    }
+    export_request2 = fill_time_range(EXPORT_MONTHLY_JSON, (now - timedelta(days=30)).isoformat(), now_iso)
     
-    example.client.publish(topic, json.dumps(export_request2))
-    time.sleep(2)
+    example.request(topic, export_request2)
     
     example.client.loop_stop()
     example.client.disconnect()
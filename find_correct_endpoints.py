@@ -4,17 +4,36 @@ Find Correct API Endpoints for Your Presient Backend
 Tests different endpoint patterns to find the right ones
 """
 
-import requests
+import aiohttp
+import asyncio
 import json
 import logging
 
+from presient_debug import get_session, run
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def find_login_endpoint():
+# Every probe shares the pooled session and gives up after this long
+PROBE_TIMEOUT = aiohttp.ClientTimeout(total=5)
+
+async def _probe(session, method, endpoint, **kwargs):
+    """Send one probe; returns (status, JSON body or None), or the exception raised"""
+    try:
+        async with session.request(method, endpoint, timeout=PROBE_TIMEOUT, **kwargs) as response:
+            data = None
+            if response.status == 200 and response.content_type == "application/json":
+                data = await response.json()
+            return response.status, data
+    except Exception as e:
+        return e
+
+def _login_body(data_format, credentials):
+    """Request kwargs that send credentials as form data or as JSON"""
+    return {"data": credentials} if data_format == "form" else {"json": credentials}
+
+async def find_login_endpoint(session):
     """Find the correct login endpoint"""
-    backend_url = "http://localhost:8000"
-    
     # Test credentials
     credentials = {
         "username": "john_doe",
@@ -35,36 +54,46 @@ def find_login_endpoint():
     
     logger.info("🔍 Testing login endpoints...")
     
-    for endpoint in login_endpoints:
-        url = f"{backend_url}{endpoint}"
+    # A HEAD is cheap and 404s for routes that do not exist (existing POST-only
+    # routes answer 405), so only send credentials to paths that are really there
+    head_results = await asyncio.gather(*(
+        _probe(session, "HEAD", endpoint) for endpoint in login_endpoints
+    ))
+    candidates = [
+        endpoint
+        for endpoint, result in zip(login_endpoints, head_results)
+        if not isinstance(result, Exception) and result[0] != 404
+    ]
+    logger.info("📍 %s of %s login paths exist: %s", len(candidates), len(login_endpoints), candidates)
+    
+    # Probe every remaining endpoint with form data (OAuth2 standard) and JSON
+    # at once, then pick the first working one in priority order
+    attempts = [
+        (endpoint, data_format)
+        for endpoint in candidates
+        for data_format in ("form", "json")
+    ]
+    results = await asyncio.gather(*(
+        _probe(session, "POST", endpoint, **_login_body(data_format, credentials))
+        for endpoint, data_format in attempts
+    ))
+    
+    for (endpoint, data_format), result in zip(attempts, results):
+        if isinstance(result, Exception):
+            logger.debug("❌ %s: %s", endpoint, result)
+            continue
         
-        try:
-            # Try form data (OAuth2 standard)
-            response = requests.post(url, data=credentials, timeout=5)
-            logger.info(f"📍 {endpoint} (form): {response.status_code}")
-            
-            if response.status_code == 200:
-                logger.info(f"✅ Found working login endpoint: {endpoint} (form data)")
-                return endpoint, "form"
-            
-            # Try JSON data
-            response = requests.post(url, json=credentials, timeout=5)
-            logger.info(f"📍 {endpoint} (json): {response.status_code}")
-            
-            if response.status_code == 200:
-                logger.info(f"✅ Found working login endpoint: {endpoint} (json data)")
-                return endpoint, "json"
-                
-        except Exception as e:
-            logger.debug(f"❌ {endpoint}: {e}")
+        logger.info("📍 %s (%s): %s", endpoint, data_format, result[0])
+        
+        if result[0] == 200:
+            logger.info("✅ Found working login endpoint: %s (%s data)", endpoint, data_format)
+            return endpoint, data_format
     
     logger.error("❌ No working login endpoint found")
     return None, None
 
-def check_existing_users():
+async def check_existing_users(session):
     """Check if we can find existing users or get more info"""
-    backend_url = "http://localhost:8000"
-    
     logger.info("🔍 Checking for existing users...")
     
     # Try to get user info without auth
@@ -76,24 +105,25 @@ def check_existing_users():
         "/profiles"
     ]
     
-    for endpoint in test_endpoints:
-        try:
-            response = requests.get(f"{backend_url}{endpoint}", timeout=5)
-            logger.info(f"📍 {endpoint}: {response.status_code}")
-            
-            if response.status_code == 200:
-                data = response.json()
-                logger.info(f"✅ {endpoint} returned data: {len(data) if isinstance(data, list) else 'object'}")
-            elif response.status_code == 401:
-                logger.info(f"🔐 {endpoint} requires authentication")
-            
-        except Exception as e:
-            logger.debug(f"❌ {endpoint}: {e}")
+    results = await asyncio.gather(*(
+        _probe(session, "GET", endpoint) for endpoint in test_endpoints
+    ))
+    
+    for endpoint, result in zip(test_endpoints, results):
+        if isinstance(result, Exception):
+            logger.debug("❌ %s: %s", endpoint, result)
+            continue
+        
+        status, data = result
+        logger.info("📍 %s: %s", endpoint, status)
+        
+        if status == 200:
+            logger.info("✅ %s returned data: %s", endpoint, len(data) if isinstance(data, list) else 'object')
+        elif status == 401:
+            logger.info("🔐 %s requires authentication", endpoint)
 
-def test_with_existing_user():
+async def test_with_existing_user(session, login_endpoint, data_format):
     """Try to use an existing user that might already be in the system"""
-    backend_url = "http://localhost:8000"
-    
     logger.info("🧪 Testing with potential existing users...")
     
     # Common test users that might exist
@@ -105,44 +135,42 @@ def test_with_existing_user():
         {"username": "john_doe", "password": "UserPassword123!"}  # The one we just created
     ]
     
-    login_endpoint, data_format = find_login_endpoint()
-    
+    # Reuse the endpoint found in step 1 instead of probing for it again
     if not login_endpoint:
         logger.error("❌ No login endpoint found")
-        return None
+        return None, None
     
-    for user_creds in test_users:
-        try:
-            url = f"{backend_url}{login_endpoint}"
-            
-            if data_format == "form":
-                response = requests.post(url, data=user_creds, timeout=5)
-            else:
-                response = requests.post(url, json=user_creds, timeout=5)
-            
-            if response.status_code == 200:
-                token_data = response.json()
-                token = token_data.get("access_token")
-                logger.info(f"✅ Successful login: {user_creds['username']}")
-                logger.info(f"🔑 Token: {token[:20]}..." if token else "🔑 No access_token in response")
-                return user_creds, token
+    results = await asyncio.gather(*(
+        _probe(session, "POST", login_endpoint, **_login_body(data_format, user_creds))
+        for user_creds in test_users
+    ))
+    
+    for user_creds, result in zip(test_users, results):
+        if isinstance(result, Exception):
+            logger.debug("❌ %s: %s", user_creds['username'], result)
+            continue
+        
+        status, token_data = result
+        if status == 200:
+            token = (token_data or {}).get("access_token")
+            logger.info("✅ Successful login: %s", user_creds['username'])
+            if token:
+                logger.info("🔑 Token: %s...", token[:20])
             else:
-                logger.info(f"❌ {user_creds['username']}: {response.status_code}")
-                
-        except Exception as e:
-            logger.debug(f"❌ {user_creds['username']}: {e}")
+                logger.info("🔑 No access_token in response")
+            return user_creds, token
+        else:
+            logger.info("❌ %s: %s", user_creds['username'], status)
     
     return None, None
 
-def test_profiles_with_token(user_creds, token):
+async def test_profiles_with_token(session, user_creds, token):
     """Test accessing profiles with the token"""
-    backend_url = "http://localhost:8000"
-    
     if not token:
         logger.error("❌ No token available")
         return False
     
-    headers = {"Authorization": f"Bearer {token}"}
+    auth_headers = {"Authorization": f"Bearer {token}"}
     
     # Test profile endpoints
     profile_endpoints = [
@@ -154,40 +182,38 @@ def test_profiles_with_token(user_creds, token):
     
     logger.info("🧪 Testing profile endpoints with token...")
     
-    for endpoint in profile_endpoints:
-        try:
-            response = requests.get(f"{backend_url}{endpoint}", headers=headers, timeout=5)
-            logger.info(f"📍 {endpoint}: {response.status_code}")
-            
-            if response.status_code == 200:
-                data = response.json()
-                if isinstance(data, list):
-                    logger.info(f"✅ {endpoint} returned {len(data)} profiles")
-                    for i, profile in enumerate(data[:3]):  # Show first 3
-                        name = profile.get("name", "Unknown")
-                        baseline = profile.get("heart_rate_baseline", "N/A")
-                        logger.info(f"   📋 Profile {i+1}: {name} (HR: {baseline})")
-                else:
-                    logger.info(f"✅ {endpoint} returned profile data")
-                return True
-                
-        except Exception as e:
-            logger.debug(f"❌ {endpoint}: {e}")
+    results = await asyncio.gather(*(
+        _probe(session, "GET", endpoint, headers=auth_headers) for endpoint in profile_endpoints
+    ))
+    
+    for endpoint, result in zip(profile_endpoints, results):
+        if isinstance(result, Exception):
+            logger.debug("❌ %s: %s", endpoint, result)
+            continue
+        
+        status, data = result
+        logger.info("📍 %s: %s", endpoint, status)
+        
+        if status == 200:
+            if isinstance(data, list):
+                logger.info("✅ %s returned %s profiles", endpoint, len(data))
+                for i, profile in enumerate(data[:3]):  # Show first 3
+                    name = profile.get("name", "Unknown")
+                    baseline = profile.get("heart_rate_baseline", "N/A")
+                    logger.info("   📋 Profile %s: %s (HR: %s)", i+1, name, baseline)
+            else:
+                logger.info("✅ %s returned profile data", endpoint)
+            return True
     
     return False
 
-def create_profile_with_correct_endpoint(user_creds, token):
+async def create_profile_with_correct_endpoint(session, user_creds, token):
     """Create your biometric profile using the correct endpoints"""
-    backend_url = "http://localhost:8000"
-    
     if not token:
         logger.error("❌ No token for profile creation")
         return False
     
-    headers = {
-        "Authorization": f"Bearer {token}",
-        "Content-Type": "application/json"
-    }
+    auth_headers = {"Authorization": f"Bearer {token}"}
     
     # Your real heart rate data
     profile_data = {
@@ -199,7 +225,8 @@ def create_profile_with_correct_endpoint(user_creds, token):
         "enrollment_source": "real_mr60bha2_data_80_104_bpm"
     }
     
-    # Try different profile creation endpoints
+    # Try different profile creation endpoints one at a time so the profile
+    # is never created twice
     profile_endpoints = [
         "/api/profiles",
         "/profiles"
@@ -209,43 +236,44 @@ def create_profile_with_correct_endpoint(user_creds, token):
     
     for endpoint in profile_endpoints:
         try:
-            response = requests.post(
-                f"{backend_url}{endpoint}",
+            async with session.post(
+                endpoint,
                 json=profile_data,
-                headers=headers,
-                timeout=10
-            )
-            
-            logger.info(f"📍 {endpoint}: {response.status_code}")
-            
-            if response.status_code == 201:
-                logger.info(f"✅ Profile created successfully!")
-                logger.info(f"💓 Your biometric signature: 80-104 BPM range")
-                return True
-            elif response.status_code != 404:
-                logger.error(f"❌ Profile creation failed: {response.text}")
+                headers=auth_headers,
+                timeout=aiohttp.ClientTimeout(total=10)
+            ) as response:
+                logger.info("📍 %s: %s", endpoint, response.status)
+                
+                if response.status == 201:
+                    logger.info("✅ Profile created successfully!")
+                    logger.info("💓 Your biometric signature: 80-104 BPM range")
+                    return True
+                elif response.status != 404:
+                    logger.error("❌ Profile creation failed: %s", await response.text())
                 
         except Exception as e:
-            logger.debug(f"❌ {endpoint}: {e}")
+            logger.debug("❌ %s: %s", endpoint, e)
     
     return False
 
-def main():
+async def main():
     """Main discovery and setup function"""
     logger.info("🎯 Presient API Endpoint Discovery & Profile Setup")
     logger.info("=" * 60)
     
+    session = get_session()
+    
     # Step 1: Find login endpoint
     logger.info("🔍 Step 1: Finding login endpoint...")
-    login_endpoint, data_format = find_login_endpoint()
+    login_endpoint, data_format = await find_login_endpoint(session)
     
     # Step 2: Check existing setup
     logger.info("\n🔍 Step 2: Checking existing users/profiles...")
-    check_existing_users()
+    await check_existing_users(session)
     
     # Step 3: Test authentication
     logger.info("\n🔐 Step 3: Testing authentication...")
-    user_creds, token = test_with_existing_user()
+    user_creds, token = await test_with_existing_user(session, login_endpoint, data_format)
     
     if not token:
         logger.error("❌ Could not authenticate with any user")
@@ -253,8 +281,8 @@ def main():
         return
     
     # Step 4: Test profiles
-    logger.info(f"\n📋 Step 4: Testing profiles with user: {user_creds['username']}")
-    profile_access = test_profiles_with_token(user_creds, token)
+    logger.info("\n📋 Step 4: Testing profiles with user: %s", user_creds['username'])
+    profile_access = await test_profiles_with_token(session, user_creds, token)
     
     if not profile_access:
         logger.error("❌ Could not access profiles")
@@ -262,14 +290,14 @@ def main():
     
     # Step 5: Create your biometric profile
     logger.info("\n🎯 Step 5: Creating your real biometric profile...")
-    profile_created = create_profile_with_correct_endpoint(user_creds, token)
+    profile_created = await create_profile_with_correct_endpoint(session, user_creds, token)
     
     # Results
     logger.info("\n📊 Discovery Results:")
-    logger.info(f"   Login Endpoint: {login_endpoint} ({data_format})")
-    logger.info(f"   Authentication: {'✅' if token else '❌'}")
-    logger.info(f"   Profile Access: {'✅' if profile_access else '❌'}")
-    logger.info(f"   Profile Created: {'✅' if profile_created else '❌'}")
+    logger.info("   Login Endpoint: %s (%s)", login_endpoint, data_format)
+    logger.info("   Authentication: %s", '✅' if token else '❌')
+    logger.info("   Profile Access: %s", '✅' if profile_access else '❌')
+    logger.info("   Profile Created: %s", '✅' if profile_created else '❌')
     
     if token and profile_access and profile_created:
         logger.info("\n🎉 SUCCESS! Your real biometric profile is ready!")
@@ -278,13 +306,13 @@ def main():
         logger.info("   Walk near your MR60BHA2 sensor")
         logger.info("   Expected: Ring-style notifications when detected!")
         
-        logger.info(f"\n🔧 Working credentials:")
-        logger.info(f"   Username: {user_creds['username']}")
-        logger.info(f"   Password: {user_creds['password']}")
-        logger.info(f"   Login endpoint: {login_endpoint}")
+        logger.info("\n🔧 Working credentials:")
+        logger.info("   Username: %s", user_creds['username'])
+        logger.info("   Password: %s", user_creds['password'])
+        logger.info("   Login endpoint: %s", login_endpoint)
     else:
         logger.error("\n❌ Setup incomplete")
         logger.info("💡 Check the API docs for correct endpoints: http://localhost:8000/docs")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    asyncio.run(run(main()))
\ No newline at end of file
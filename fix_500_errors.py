@@ -6,6 +6,15 @@ Fix common issues causing 500 errors
 import os
 import re
 
+# Primary key columns that are missing a UUID default
+_UUID_PAT = re.compile(r'id = Column\(String, primary_key=True\)')
+_UUID_REPL = 'id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))'
+
+def _add_uuid_defaults(content):
+    """Add the uuid import if needed and give String primary keys a UUID default"""
+    prefix = "" if "import uuid" in content else "import uuid\n"
+    return prefix + _UUID_PAT.sub(_UUID_REPL, content)
+
 def fix_profile_model():
     """Fix profile model issues"""
     print("Fixing profile model...")
@@ -13,19 +22,8 @@ def fix_profile_model():
     with open("backend/models/profile.py", "r") as f:
         content = f.read()
     
-    # Fix imports
-    if "import uuid" not in content:
-        content = "import uuid\n" + content
-    
-    # Fix UUID defaults
-    content = re.sub(
-        r'id = Column\(String, primary_key=True\)',
-        'id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))',
-        content
-    )
-    
-    # Fix relationship name
-    content = content.replace("PresenceEvents", "PresenceEvent")
+    # Fix imports, UUID defaults and the relationship name
+    content = _add_uuid_defaults(content).replace("PresenceEvents", "PresenceEvent")
     
     with open("backend/models/profile.py", "w") as f:
         f.write(content)
@@ -39,16 +37,8 @@ def fix_presence_model():
     with open("backend/models/presence_events.py", "r") as f:
         content = f.read()
     
-    # Fix imports
-    if "import uuid" not in content:
-        content = "import uuid\n" + content
-    
-    # Fix UUID defaults
-    content = re.sub(
-        r'id = Column\(String, primary_key=True\)',
-        'id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))',
-        content
-    )
+    # Fix imports and UUID defaults
+    content = _add_uuid_defaults(content)
     
     with open("backend/models/presence_events.py", "w") as f:
         f.write(content)
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Shared paths, patterns and file helpers for the fix_*.py scripts
+"""
+
+import ast
+import os
+import re
+import sys
+from pathlib import Path
+
+PRESENCE_PATH = Path('backend/routes/presence.py')
+PROFILES_PATH = Path('backend/routes/profiles.py')
+
+# Patterns are compiled once at import
+ROUTER_PREFIX_PATTERN = re.compile(r'router\s*=\s*APIRouter\s*\(\s*prefix\s*=\s*["\']\/presence["\']\s*,\s*tags\s*=\s*\["Presence"\]\s*\)')
+EVENT_FUNCTION_PATTERN = re.compile(r'(@router\.post\("/event".*?\n.*?async def create_presence_event.*?)(?=\n@router|\n\nasync def|\Z)', re.DOTALL)
+JSON_RESPONSE_PATTERN = re.compile(r'return JSONResponse\((.*?)\)', re.DOTALL)
+EVENT_DECORATOR_PATTERN = re.compile(r'@router\.post\("/event", response_model=PresenceEventResponse.*?\)')
+STATUS_FUNCTION_PATTERN = re.compile(r'(@router\.get\("/status/\{user_id\}".*?\n.*?async def get_user_presence_status.*?)(?=\n@router|\n\nasync def|\Z)', re.DOTALL)
+PROFILE_QUERY_PATTERN = re.compile(r'profile = db\.query\(Profile\)\.filter\(Profile\.\w+ == user_id\)\.first\(\)')
+IMPORT_LINE_PATTERN = re.compile(r'^(?:from|import).*$', re.MULTILINE)
+PROFILE_CREATION_PATTERN = re.compile(r'(profile = Profile\([\s\S]*?\))')
+
+# Text of every file loaded so far, kept in step with what is on disk
+_texts = {}
+
+
+def load(path):
+    """Return the text of path, reading it from disk only once per process
+
+    Files are read and written as UTF-8 whatever the locale, since the
+    scripts and the modules they patch contain non-ASCII text.
+    """
+    if path not in _texts:
+        _texts[path] = path.read_text(encoding='utf-8')
+    return _texts[path]
+
+
+def atomic_write(path, text):
+    """Replace path with text in one write and an atomic rename
+
+    A failure part-way through leaves the original file untouched instead of
+    a truncated module.
+    """
+    path = Path(path)
+    tmp_path = path.with_name(path.name + '.tmp')
+    tmp_path.write_text(text, encoding='utf-8')
+    os.replace(tmp_path, path)
+
+
+def save(path, text):
+    """Write text to path unless it is unchanged; returns True if written
+
+    A path that was never loaded is read first so a generated file is not
+    rewritten with identical content.
+    """
+    if path not in _texts:
+        try:
+            load(path)
+        except FileNotFoundError:
+            pass
+    if _texts.get(path) == text:
+        return False
+    atomic_write(path, text)
+    _texts[path] = text
+    return True
+
+
+def edit_file(path, *transforms):
+    """Read path once, pass its text through each transform, and save it once
+
+    Returns True if the file changed.
+    """
+    text = load(path)
+    for transform in transforms:
+        text = transform(text)
+    return save(path, text)
+
+
+def buffer_output():
+    """Block-buffer stdout so the fix reports go out in a few large writes
+
+    A terminal makes stdout line-buffered, which costs one write() per
+    print(). Everything still left in the buffer is flushed at exit.
+    Streams without reconfigure() (e.g. a replaced sys.stdout) are left as is.
+    """
+    reconfigure = getattr(sys.stdout, "reconfigure", None)
+    if reconfigure is not None:
+        reconfigure(line_buffering=False, write_through=False)
+
+
+def _offset(lines, starts, lineno, col):
+    """Convert an ast (lineno, UTF-8 byte col) position to a string offset"""
+    return starts[lineno - 1] + len(lines[lineno - 1].encode()[:col].decode())
+
+
+def _node_spans(content, match_node):
+    """Yield (start, end, node) for every node match_node accepts, in source order
+
+    Decorated definitions start at their first decorator. Raises SyntaxError
+    if content does not parse.
+    """
+    tree = ast.parse(content)
+    lines = content.split('\n')
+    starts = [0]
+    for line in lines:
+        starts.append(starts[-1] + len(line) + 1)
+
+    nodes = sorted((node for node in ast.walk(tree) if match_node(node)),
+                   key=lambda node: (node.lineno, node.col_offset))
+    for node in nodes:
+        first = min([node] + getattr(node, 'decorator_list', []), key=lambda n: n.lineno)
+        # The '@' of a decorator sits one column before its expression
+        start_col = first.col_offset - 1 if first is not node else node.col_offset
+        yield (_offset(lines, starts, first.lineno, start_col),
+               _offset(lines, starts, node.end_lineno, node.end_col_offset),
+               node)
+
+
+def find_function(content, name, fallback_pattern):
+    """Return the (start, end) span of the top-level function name, or None
+
+    The span runs from the first decorator to the end of the body. If content
+    does not parse, fallback_pattern's first group is used instead.
+    """
+    try:
+        for start, end, _ in _node_spans(
+            content,
+            lambda node: isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and node.name == name,
+        ):
+            return start, end
+        return None
+    except SyntaxError:
+        match = fallback_pattern.search(content)
+        return match.span(1) if match else None
+
+
+def find_profile_creations(content):
+    """Return the (start, end) spans of every `<name> = Profile(...)` statement
+
+    Nested parentheses or strings containing ')' inside the call do not cut
+    it short. Falls back to PROFILE_CREATION_PATTERN if content does not parse.
+    """
+    def is_profile_creation(node):
+        return (
+            isinstance(node, ast.Assign)
+            and len(node.targets) == 1
+            and isinstance(node.targets[0], ast.Name)
+            and isinstance(node.value, ast.Call)
+            and getattr(node.value.func, 'id', None) == 'Profile'
+        )
+
+    try:
+        return [(start, end) for start, end, _ in _node_spans(content, is_profile_creation)]
+    except SyntaxError:
+        return [match.span(1) for match in PROFILE_CREATION_PATTERN.finditer(content)]
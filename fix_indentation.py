@@ -3,42 +3,46 @@
 Fix the indentation error in test_integration.py
 """
 
+import re
+
+# The isinstance guard and the line under it, whatever their current indentation
+EVENT_GUARD_PATTERN = re.compile(
+    r'^[ \t]*if isinstance\(event, str\):\n[ \t]*event = json\.loads\(event\)\n',
+    re.MULTILINE
+)
+EVENT_GUARD = '        if isinstance(event, str):\n            event = json.loads(event)\n'
+
+def show_lines(content, title):
+    """Print lines 70-80 of the file"""
+    print(title)
+    for i, line in enumerate(content.splitlines(keepends=True)[69:80], 70):
+        print(f"{i:3d}: {line}", end='')
+
 print("🔧 Fixing indentation error in test_integration.py...\n")
 
 # Read the file
 with open('tests/test_integration.py', 'r') as f:
-    lines = f.readlines()
+    content = f.read()
 
 # Find the problematic lines around line 75-76
-print("📋 Lines around the error (70-80):")
-for i in range(69, min(80, len(lines))):
-    print(f"{i+1:3d}: {lines[i]}", end='')
+show_lines(content, "📋 Lines around the error (70-80):")
 
 print("\n" + "="*60 + "\n")
 
-# Fix the indentation issue
-# The problem is that the if statement needs proper indentation
-fixed_lines = []
-for i, line in enumerate(lines):
-    if i == 74 and 'if isinstance(event, str):' in line:
-        # Make sure this line has proper indentation (8 spaces for being inside the test function)
-        fixed_lines.append('        if isinstance(event, str):\n')
-    elif i == 75 and 'event = json.loads(event)' in line:
-        # This line needs to be indented under the if (12 spaces)
-        fixed_lines.append('            event = json.loads(event)\n')
-    else:
-        fixed_lines.append(line)
+# Fix the indentation issue in one substitution on the whole file:
+# the if statement sits inside the test function (8 spaces) and its body
+# is indented under it (12 spaces)
+fixed = EVENT_GUARD_PATTERN.sub(EVENT_GUARD, content, count=1)
 
 # Write back the fixed content
-with open('tests/test_integration.py', 'w') as f:
-    f.writelines(fixed_lines)
+if fixed != content:
+    with open('tests/test_integration.py', 'w') as f:
+        f.write(fixed)
 
 print("✓ Fixed indentation")
 
 # Show the fixed section
-print("\n📋 Fixed lines (70-80):")
-for i in range(69, min(80, len(fixed_lines))):
-    print(f"{i+1:3d}: {fixed_lines[i]}", end='')
+show_lines(fixed, "\n📋 Fixed lines (70-80):")
 
 print("\n✅ Indentation fixed!")
 print("\n🎯 Now run: pytest tests/ -v")
\ No newline at end of file
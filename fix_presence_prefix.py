@@ -3,54 +3,24 @@
 Fix the presence router prefix to use /api/presence
 """
 
-import re
-
-print("🔧 Fixing presence router prefix...\n")
-
-# Read presence.py
-with open('backend/routes/presence.py', 'r') as f:
-    content = f.read()
-
-# Find and replace the router definition
-old_router = 'router = APIRouter(prefix="/presence", tags=["Presence"])'
-new_router = 'router = APIRouter(prefix="/api/presence", tags=["Presence"])'
-
-if old_router in content:
-    content = content.replace(old_router, new_router)
-    print("✓ Changed router prefix from /presence to /api/presence")
-else:
-    # Try regex pattern in case there's extra whitespace
-    pattern = r'router\s*=\s*APIRouter\s*\(\s*prefix\s*=\s*["\']\/presence["\']\s*,\s*tags\s*=\s*\["Presence"\]\s*\)'
-    if re.search(pattern, content):
-        content = re.sub(pattern, 'router = APIRouter(prefix="/api/presence", tags=["Presence"])', content)
-        print("✓ Changed router prefix from /presence to /api/presence (regex)")
-    else:
-        print("⚠️  Could not find router definition to update")
-        print("Current router definition:")
-        router_match = re.search(r'router\s*=\s*APIRouter.*', content)
-        if router_match:
-            print(router_match.group(0))
-
-# Save the file
-with open('backend/routes/presence.py', 'w') as f:
-    f.write(content)
+import subprocess
+import sys
 
-print("\n✅ Fixed presence router prefix!")
+from fix_common import (
+    EVENT_FUNCTION_PATTERN,
+    PRESENCE_PATH,
+    ROUTER_PREFIX_PATTERN,
+    buffer_output,
+    find_function,
+    load,
+    save,
+)
 
-# Also add the missing /events endpoint if it's not there
-print("\n🔍 Checking for /events endpoint...")
+OLD_ROUTER = 'router = APIRouter(prefix="/presence", tags=["Presence"])'
+NEW_ROUTER = 'router = APIRouter(prefix="/api/presence", tags=["Presence"])'
 
-if '@router.get("/events")' not in content:
-    print("❌ Missing /events endpoint!")
-    
-    # Find a good place to add it (after the event creation endpoint)
-    event_endpoint_match = re.search(r'(@router\.post\("/event".*?\n.*?async def create_presence_event.*?(?=\n@router|\Z))', content, re.DOTALL)
-    
-    if event_endpoint_match:
-        insertion_point = event_endpoint_match.end()
-        
-        # Add the events list endpoint
-        events_endpoint = '''
+# The events list endpoint added after create_presence_event when missing
+EVENTS_ENDPOINT = '''
 
 @router.get("/events")
 async def list_presence_events(
@@ -112,32 +82,77 @@ async def list_presence_events(
         logger.error(f"Error listing presence events: {e}")
         raise HTTPException(status_code=500, detail="Failed to retrieve presence events")
 '''
-        
-        # Insert the endpoint
-        content = content[:insertion_point] + events_endpoint + content[insertion_point:]
-        
-        # Save again
-        with open('backend/routes/presence.py', 'w') as f:
-            f.write(content)
-        
+
+
+def fix_prefix(content):
+    """Return content with the presence router mounted at /api/presence"""
+    if OLD_ROUTER in content:
+        content = content.replace(OLD_ROUTER, NEW_ROUTER)
+        print("✓ Changed router prefix from /presence to /api/presence")
+    else:
+        # Try regex pattern in case there's extra whitespace
+        content, replaced = ROUTER_PREFIX_PATTERN.subn(NEW_ROUTER, content)
+        if replaced:
+            print("✓ Changed router prefix from /presence to /api/presence (regex)")
+        else:
+            print("⚠️  Could not find router definition to update")
+            print("Current router definition:")
+            router_pos = content.find('router = APIRouter')
+            if router_pos != -1:
+                line_end = content.find('\n', router_pos)
+                print(content[router_pos:line_end if line_end != -1 else None])
+
+    print("\n✅ Fixed presence router prefix!")
+    return content
+
+
+def ensure_events(content):
+    """Return content with the /events list endpoint added if it is missing"""
+    print("\n🔍 Checking for /events endpoint...")
+
+    if '@router.get("/events")' in content:
+        print("✓ /events endpoint already exists")
+        return content
+
+    print("❌ Missing /events endpoint!")
+
+    # Find a good place to add it (after the event creation endpoint)
+    span = find_function(content, 'create_presence_event', EVENT_FUNCTION_PATTERN)
+    if span:
+        insertion_point = span[1]
+        content = content[:insertion_point] + EVENTS_ENDPOINT + content[insertion_point:]
         print("✓ Added /events endpoint")
-else:
-    print("✓ /events endpoint already exists")
+    return content
 
-print("\n📋 Running route inspection again...")
-print("="*60)
 
-# Run the inspection script
-import subprocess
-result = subprocess.run(['python', 'inspect_routes.py'], capture_output=True, text=True)
-print(result.stdout)
-
-print("\n✅ All fixes applied!")
-print("\n🎯 Next steps:")
-print("1. Restart your server")
-print("2. Run tests: pytest tests/ -v")
-print("\nThe presence routes should now be available at:")
-print("  - POST /api/presence/event")
-print("  - GET  /api/presence/events")
-print("  - GET  /api/presence/status/{user_id}")
-print("  - etc.")
\ No newline at end of file
+def main():
+    buffer_output()
+    print("🔧 Fixing presence router prefix...\n")
+
+    content = ensure_events(fix_prefix(load(PRESENCE_PATH)))
+
+    # Save both edits with a single write, and only re-run the route
+    # inspection if something was actually changed
+    if save(PRESENCE_PATH, content):
+        print("\n📋 Running route inspection again...")
+        print("="*60)
+
+        # Run the inspection script with this interpreter
+        result = subprocess.run([sys.executable, 'inspect_routes.py'], capture_output=True, text=True)
+        print(result.stdout)
+    else:
+        print("\nNo changes; skipping route inspection")
+
+    print("\n✅ All fixes applied!")
+    print("\n🎯 Next steps:")
+    print("1. Restart your server")
+    print("2. Run tests: pytest tests/ -v")
+    print("\nThe presence routes should now be available at:")
+    print("  - POST /api/presence/event")
+    print("  - GET  /api/presence/events")
+    print("  - GET  /api/presence/status/{user_id}")
+    print("  - etc.")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,20 +3,20 @@
 Fix the presence event response to return proper JSON
 """
 
-import re
+from fix_common import (
+    EVENT_DECORATOR_PATTERN,
+    EVENT_FUNCTION_PATTERN,
+    JSON_RESPONSE_PATTERN,
+    PRESENCE_PATH,
+    buffer_output,
+    find_function,
+    load,
+    save,
+)
 
-print("🔧 Fixing presence event response...\n")
 
-# Read presence.py
-with open('backend/routes/presence.py', 'r') as f:
-    content = f.read()
-
-# Find the create_presence_event function
-pattern = r'(@router\.post\("/event".*?\n.*?async def create_presence_event.*?)(?=\n@router|\n\nasync def|\Z)'
-match = re.search(pattern, content, re.DOTALL)
-
-if match:
-    function_content = match.group(1)
+def rewrite_event_function(function_content):
+    """Return the create_presence_event source with the JSONResponse unwrapped"""
     print("Found create_presence_event function")
     
     # Check what's being returned
@@ -24,8 +24,7 @@ if match:
         print("✓ Using JSONResponse")
         
         # Find the JSONResponse section
-        json_response_pattern = r'return JSONResponse\((.*?)\)'
-        json_match = re.search(json_response_pattern, function_content, re.DOTALL)
+        json_match = JSON_RESPONSE_PATTERN.search(function_content)
         
         if json_match:
             print("\nCurrent JSONResponse content:")
@@ -35,41 +34,75 @@ if match:
             # Let's fix it to return the dict directly
             if 'event_dict' in function_content:
                 # Replace the JSONResponse with just returning the dict
-                new_function = function_content.replace(
+                function_content = function_content.replace(
                     'return JSONResponse(\n            status_code=status.HTTP_201_CREATED,\n            content=event_dict\n        )',
                     'return event_dict'
                 )
                 
                 # Also need to update the response_model
-                new_function = re.sub(
-                    r'@router\.post\("/event", response_model=PresenceEventResponse.*?\)',
+                function_content = EVENT_DECORATOR_PATTERN.sub(
                     '@router.post("/event", response_model=PresenceEventResponse, status_code=201)',
-                    new_function
+                    function_content
                 )
                 
-                content = content.replace(function_content, new_function)
                 print("\n✓ Fixed: Now returning dict directly instead of JSONResponse")
     
     # Alternative fix: If using response_model, FastAPI handles serialization automatically
     # So we should return the Pydantic model or dict, not JSONResponse
-    
-    # Save the file
-    with open('backend/routes/presence.py', 'w') as f:
-        f.write(content)
-    
+    return function_content
+
+
+def fix_response(content):
+    """Return content with create_presence_event returning its dict directly"""
+    # Re-runs after the fix skip parsing: a plain find up to the next route
+    # is enough to see that the function already returns its dict
+    def_pos = content.find('async def create_presence_event')
+    if def_pos != -1:
+        next_route = content.find('\n@router', def_pos)
+        function_content = content[def_pos:next_route if next_route != -1 else None]
+        if 'return event_dict' in function_content and 'JSONResponse(' not in function_content:
+            print("✓ create_presence_event already returns its dict")
+            return content
+
+    # Find the create_presence_event function (cheap substring check first so
+    # files without the endpoint skip parsing entirely)
+    span = None
+    if 'create_presence_event' in content:
+        span = find_function(content, 'create_presence_event', EVENT_FUNCTION_PATTERN)
+
+    if not span:
+        print("Nothing to do: create_presence_event not found")
+        return content
+
+    start, end = span
+    content = content[:start] + rewrite_event_function(content[start:end]) + content[end:]
+
     print("\n✅ Fixed presence event response!")
+    return content
+
+
+def main():
+    buffer_output()
+    print("🔧 Fixing presence event response...\n")
+
+    content = fix_response(load(PRESENCE_PATH))
+    save(PRESENCE_PATH, content)
+
+    # Show the updated function
+    print("\n📋 Updated function (excerpt):")
+    pattern = r'return event_dict'
+    if pattern in content:
+        # Find context around the return
+        idx = content.find(pattern)
+        start = max(0, idx - 200)
+        end = min(len(content), idx + 100)
+        print("..." + content[start:end] + "...")
+
+    print("\n✅ The endpoint should now return proper JSON!")
+    print("\n🎯 Next steps:")
+    print("1. Restart your server")
+    print("2. Run the test again: pytest tests/test_integration.py -s -v")
+
 
-# Show the updated function
-print("\n📋 Updated function (excerpt):")
-pattern = r'return event_dict'
-if pattern in content:
-    # Find context around the return
-    idx = content.find(pattern)
-    start = max(0, idx - 200)
-    end = min(len(content), idx + 100)
-    print("..." + content[start:end] + "...")
-
-print("\n✅ The endpoint should now return proper JSON!")
-print("\n🎯 Next steps:")
-print("1. Restart your server")
-print("2. Run the test again: pytest tests/test_integration.py -s -v")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
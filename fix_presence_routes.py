@@ -4,127 +4,136 @@ Check and fix presence route registration
 """
 
 import re
+from pathlib import Path
 
-print("🔍 Checking route registration...\n")
-
-# 1. Check main.py for route imports and registration
-print("📋 Checking main.py...")
-with open('backend/main.py', 'r') as f:
-    main_content = f.read()
-
-# Check imports
-if 'from backend.routes import' in main_content:
-    import_match = re.search(r'from backend\.routes import ([^)]+)', main_content)
-    if import_match:
-        imported = import_match.group(1)
-        print(f"Imported routes: {imported}")
-        if 'presence' not in imported:
-            print("❌ 'presence' not in imports!")
-        else:
-            print("✓ 'presence' is imported")
-
-# Check route registration
-if 'app.include_router(presence.router)' in main_content:
-    print("✓ presence.router is registered")
-else:
-    print("❌ presence.router NOT registered!")
-
-# 2. Check presence.py router configuration
-print("\n📋 Checking presence.py router configuration...")
-with open('backend/routes/presence.py', 'r') as f:
-    presence_content = f.read()
-
-# Check router creation
-router_match = re.search(r'router\s*=\s*APIRouter\((.*?)\)', presence_content, re.DOTALL)
-if router_match:
-    router_config = router_match.group(1)
-    print(f"Router configuration: {router_config.strip()}")
-    if '/api/presence' not in router_config:
-        print("❌ Router prefix not set to /api/presence")
-    else:
-        print("✓ Router has correct prefix")
-
-# 3. Fix issues
-print("\n🔧 Fixing issues...")
-
-# Fix main.py
-needs_save = False
-
-# Ensure presence is imported
-if 'presence' not in main_content:
-    main_content = re.sub(
-        r'from backend\.routes import (.*?)$',
-        r'from backend.routes import \1, presence',
-        main_content,
-        flags=re.MULTILINE
-    )
-    print("✓ Added presence to imports")
-    needs_save = True
-
-# Ensure presence router is registered
-if 'app.include_router(presence.router)' not in main_content:
-    # Find a good place to add it (after auth router)
-    auth_router_pos = main_content.find('app.include_router(auth.router)')
-    if auth_router_pos != -1:
-        # Find the end of the line
-        line_end = main_content.find('\n', auth_router_pos)
-        if line_end != -1:
-            main_content = (
-                main_content[:line_end] + 
-                '\napp.include_router(presence.router)' + 
-                main_content[line_end:]
-            )
-            print("✓ Added presence router registration")
-            needs_save = True
-    else:
-        # Add it at the end of routers section
-        print("⚠️  Could not find a good place to add presence router")
+from fix_common import PRESENCE_PATH, PROFILES_PATH, buffer_output, load, save
 
-if needs_save:
-    with open('backend/main.py', 'w') as f:
-        f.write(main_content)
-    print("✓ Saved main.py")
+MAIN_PATH = Path('backend/main.py')
 
-# 4. List all registered routes to verify
-print("\n📋 Creating route inspection script...")
-inspection_script = '''
+# Patterns are compiled once at import
+ROUTES_IMPORT_PATTERN = re.compile(r'from backend\.routes import ([^)]+)')
+ROUTES_IMPORT_LINE_PATTERN = re.compile(r'from backend\.routes import (.*?)$', re.MULTILINE)
+
+# Written to inspect_routes.py to list the registered routes
+INSPECTION_SCRIPT = '''
 import sys
 sys.path.append('.')
 
 from backend.main import app
 
 print("\\n🔍 Registered Routes:\\n")
+# Print the routes and count the presence ones in the same pass
+presence_count = 0
 for route in app.routes:
-    if hasattr(route, 'methods') and hasattr(route, 'path'):
+    if not hasattr(route, 'path'):
+        continue
+    if hasattr(route, 'methods'):
         methods = ', '.join(route.methods) if route.methods else 'N/A'
         print(f"{methods:<10} {route.path}")
+    if '/presence' in route.path:
+        presence_count += 1
 
-# Count presence routes
-presence_routes = [r for r in app.routes if hasattr(r, 'path') and '/presence' in r.path]
-print(f"\\n✓ Found {len(presence_routes)} presence routes")
+print(f"\\n✓ Found {presence_count} presence routes")
 '''
 
-with open('inspect_routes.py', 'w') as f:
-    f.write(inspection_script)
 
-print("\n✓ Created inspect_routes.py")
-print("\nRun: python inspect_routes.py")
-print("to see all registered routes")
+def main():
+    buffer_output()
+    print("🔍 Checking route registration...\n")
+
+    # 1. Check main.py for route imports and registration
+    print("📋 Checking main.py...")
+    main_content = load(MAIN_PATH)
+
+    # Check imports
+    if 'from backend.routes import' in main_content:
+        import_match = ROUTES_IMPORT_PATTERN.search(main_content)
+        if import_match:
+            imported = import_match.group(1)
+            print(f"Imported routes: {imported}")
+            if 'presence' not in imported:
+                print("❌ 'presence' not in imports!")
+            else:
+                print("✓ 'presence' is imported")
+
+    # Check route registration
+    if 'app.include_router(presence.router)' in main_content:
+        print("✓ presence.router is registered")
+    else:
+        print("❌ presence.router NOT registered!")
+
+    # 2. Check presence.py router configuration
+    print("\n📋 Checking presence.py router configuration...")
+    presence_content = load(PRESENCE_PATH)
+
+    # Check router creation
+    config_start = presence_content.find('APIRouter(')
+    config_end = presence_content.find(')', config_start)
+    if config_start != -1 and config_end != -1:
+        router_config = presence_content[config_start + len('APIRouter('):config_end]
+        print(f"Router configuration: {router_config.strip()}")
+        if '/api/presence' not in router_config:
+            print("❌ Router prefix not set to /api/presence")
+        else:
+            print("✓ Router has correct prefix")
+
+    # 3. Fix issues
+    print("\n🔧 Fixing issues...")
+
+    # Fix main.py in a single walk over its lines
+    add_import = 'presence' not in main_content
+    add_router = 'app.include_router(presence.router)' not in main_content
+
+    if add_import or add_router:
+        out_lines = []
+        for line in main_content.splitlines(keepends=True):
+            # Ensure presence is imported
+            if add_import and 'from backend.routes import' in line:
+                line = ROUTES_IMPORT_LINE_PATTERN.sub(r'from backend.routes import \1, presence', line)
+                print("✓ Added presence to imports")
+            out_lines.append(line)
+
+            # Ensure presence router is registered (after auth router)
+            if add_router and 'app.include_router(auth.router)' in line and line.endswith('\n'):
+                out_lines.append('app.include_router(presence.router)\n')
+                add_router = False
+                print("✓ Added presence router registration")
+
+        if add_router:
+            # Add it at the end of routers section
+            print("⚠️  Could not find a good place to add presence router")
+
+        main_content = ''.join(out_lines)
+
+    if save(MAIN_PATH, main_content):
+        print("✓ Saved main.py")
+
+    # 4. List all registered routes to verify
+    print("\n📋 Creating route inspection script...")
+    if save(Path('inspect_routes.py'), INSPECTION_SCRIPT):
+        print("\n✓ Created inspect_routes.py")
+    else:
+        print("\n✓ inspect_routes.py is up to date")
+    print("\nRun: python inspect_routes.py")
+    print("to see all registered routes")
 
-# 5. Also fix the deprecated .dict() call in profiles.py
-print("\n🔧 Fixing deprecated .dict() call...")
-with open('backend/routes/profiles.py', 'r') as f:
-    profiles_content = f.read()
+    # 5. Also fix the deprecated .dict() call in profiles.py
+    print("\n🔧 Fixing deprecated .dict() call...")
+    profiles_content = load(PROFILES_PATH)
 
-profiles_content = profiles_content.replace('.dict(exclude_unset=True)', '.model_dump(exclude_unset=True)')
+    profiles_content = profiles_content.replace('.dict(exclude_unset=True)', '.model_dump(exclude_unset=True)')
+
+    if save(PROFILES_PATH, profiles_content):
+        print("✓ Fixed deprecated .dict() call")
+    else:
+        print("✓ No deprecated .dict() calls left")
 
-with open('backend/routes/profiles.py', 'w') as f:
-    f.write(profiles_content)
+    print("\n✅ Fixes complete!")
+    print("\n🎯 Next steps:")
+    print("1. Run: python inspect_routes.py")
+    print("2. Restart your server")
+    print("3. Run tests again: pytest tests/ -v")
 
-print("✓ Fixed deprecated .dict() call")
 
-print("\n✅ Fixes complete!")
-print("\n🎯 Next steps:")
-print("1. Run: python inspect_routes.py")
-print("2. Restart your server")
-print("3. Run tests again: pytest tests/ -v")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -3,29 +3,22 @@
 Fix the presence status endpoint to handle username vs UUID properly
 """
 
-import re
+from fix_common import (
+    IMPORT_LINE_PATTERN,
+    PRESENCE_PATH,
+    PROFILE_QUERY_PATTERN,
+    STATUS_FUNCTION_PATTERN,
+    buffer_output,
+    find_function,
+    load,
+    save,
+)
 
-print("🔧 Fixing presence status endpoint...\n")
-
-# Read presence.py
-with open('backend/routes/presence.py', 'r') as f:
-    content = f.read()
-
-# Find the get_user_presence_status function
-pattern = r'(@router\.get\("/status/\{user_id\}".*?\n.*?async def get_user_presence_status.*?)(?=\n@router|\n\nasync def|\Z)'
-match = re.search(pattern, content, re.DOTALL)
-
-if match:
-    function_content = match.group(1)
-    print("Found get_user_presence_status function")
-    
-    # The issue is this line:
-    # profile = db.query(Profile).filter(Profile.id == user_id).first()
-    # It should check if user_id is actually a username or UUID
-    
-    # Replace the problematic query
-    old_query = 'profile = db.query(Profile).filter(Profile.id == user_id).first()'
-    new_query = '''# Check if user_id is a username or actual UUID
+# The issue is this line:
+# profile = db.query(Profile).filter(Profile.id == user_id).first()
+# It should check if user_id is actually a username or UUID
+OLD_QUERY = 'profile = db.query(Profile).filter(Profile.id == user_id).first()'
+NEW_QUERY = '''# Check if user_id is a username or actual UUID
     # Try to find by username first (since tests pass username)
     profile = db.query(Profile).filter(Profile.username == user_id).first()
     if not profile:
@@ -40,48 +33,79 @@ if match:
             profile = db.query(Profile).filter(Profile.id == user_id).first()
         except ValueError:
             pass'''
+
+
+def rewrite_status_function(function_content):
+    """Return the get_user_presence_status source with the profile lookup replaced"""
+    print("Found get_user_presence_status function")
     
-    if old_query in function_content:
-        function_content = function_content.replace(old_query, new_query)
-        content = content.replace(match.group(1), function_content)
+    # A lookup by username means the fix (or an equivalent one) is already in
+    # place; NEW_QUERY still contains OLD_QUERY, so applying it again would
+    # nest another copy
+    if 'Profile.username == user_id' in function_content:
+        print("✓ Profile query already handles username/UUID")
+        return function_content
+
+    # Replace the problematic query
+    if OLD_QUERY in function_content:
         print("✓ Fixed profile query to handle username/UUID properly")
-    else:
-        print("⚠️  Could not find the exact query to replace")
-        # Try a more flexible pattern
-        pattern = r'profile = db\.query\(Profile\)\.filter\(Profile\.\w+ == user_id\)\.first\(\)'
-        if re.search(pattern, function_content):
-            function_content = re.sub(pattern, new_query, function_content)
-            content = content.replace(match.group(1), function_content)
-            print("✓ Fixed profile query using regex")
-
-# Save the file
-with open('backend/routes/presence.py', 'w') as f:
-    f.write(content)
-
-print("\n✅ Fixed presence status endpoint!")
-
-# Also check if uuid is imported at the top
-if 'import uuid' not in content.split('class')[0]:  # Check imports section
-    print("\n⚠️  Note: Make sure 'import uuid' is at the top of the file")
-    # Add it if needed
-    lines = content.split('\n')
-    import_section_end = 0
-    for i, line in enumerate(lines):
-        if line.startswith('from') or line.startswith('import'):
-            import_section_end = i
-    
-    if import_section_end > 0:
-        lines.insert(import_section_end + 1, 'import uuid')
-        content = '\n'.join(lines)
-        with open('backend/routes/presence.py', 'w') as f:
-            f.write(content)
-        print("✓ Added uuid import")
-
-print("\n🎯 The fix allows the endpoint to:")
-print("1. First try to find profile by username (what tests pass)")
-print("2. Then try by user_id (foreign key to User)")
-print("3. Finally try by profile id (if it's a valid UUID)")
-print("\nThis handles all possible cases!")
-
-print("\n✅ Now run the test again:")
-print("pytest tests/test_integration.py -v")
\ No newline at end of file
+        return function_content.replace(OLD_QUERY, NEW_QUERY)
+
+    print("⚠️  Could not find the exact query to replace")
+    # Try a more flexible pattern
+    function_content, replaced = PROFILE_QUERY_PATTERN.subn(NEW_QUERY, function_content)
+    if replaced:
+        print("✓ Fixed profile query using regex")
+    return function_content
+
+
+def fix_status(content):
+    """Return content with the status lookup accepting usernames and UUIDs"""
+    # Find and rewrite the get_user_presence_status function (cheap substring
+    # check first so files without the endpoint skip parsing entirely)
+    span = None
+    if '/status/{user_id}' in content:
+        span = find_function(content, 'get_user_presence_status', STATUS_FUNCTION_PATTERN)
+
+    if span:
+        start, end = span
+        content = content[:start] + rewrite_status_function(content[start:end]) + content[end:]
+
+    print("\n✅ Fixed presence status endpoint!")
+
+    # Also check if uuid is imported at the top (everything before the first
+    # 'class' - sliced with find() rather than splitting the whole file)
+    header_end = content.find('class')
+    if 'import uuid' not in content[:header_end if header_end != -1 else None]:
+        print("\n⚠️  Note: Make sure 'import uuid' is at the top of the file")
+        # Add it after the last top-level import line if needed
+        last_import = None
+        for last_import in IMPORT_LINE_PATTERN.finditer(content):
+            pass
+        
+        if last_import and last_import.start() > 0:
+            content = content[:last_import.end()] + '\nimport uuid' + content[last_import.end():]
+            print("✓ Added uuid import")
+
+    return content
+
+
+def main():
+    buffer_output()
+    print("🔧 Fixing presence status endpoint...\n")
+
+    # Save the query fix and the import together
+    save(PRESENCE_PATH, fix_status(load(PRESENCE_PATH)))
+
+    print("\n🎯 The fix allows the endpoint to:")
+    print("1. First try to find profile by username (what tests pass)")
+    print("2. Then try by user_id (foreign key to User)")
+    print("3. Finally try by profile id (if it's a valid UUID)")
+    print("\nThis handles all possible cases!")
+
+    print("\n✅ Now run the test again:")
+    print("pytest tests/test_integration.py -v")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,11 @@
 # Fix the relationship in Profile model
 import re
+from pathlib import Path
+
+from fix_common import atomic_write
 
 # Read the Profile model
-with open('backend/models/profile.py', 'r') as f:
-    content = f.read()
+content = Path('backend/models/profile.py').read_text(encoding='utf-8')
 
 # Find and comment out or fix the relationship
 # Replace the problematic relationship line
@@ -21,7 +23,6 @@ if 'presence_events = relationship' in content and 'primaryjoin=' not in content
         '# presence_events = relationship("PresenceEvent", back_populates="profile", lazy="dynamic")  # TODO: Fix foreign key'
     )
 
-with open('backend/models/profile.py', 'w') as f:
-    f.write(content)
+atomic_write('backend/models/profile.py', content)
 
 print("Fixed Profile model relationship")
@@ -1,61 +1,87 @@
 #!/usr/bin/env python3
 """Fix the route order in profiles.py so /me routes come before /{profile_id}"""
 
-import re
-
-# Read the file
-with open('backend/routes/profiles.py', 'r') as f:
-    content = f.read()
-
-# Find all route definitions with their full function blocks
-# This regex captures from @router to the next @router or end of file
-route_pattern = r'(@router\.[^@]+?)(?=@router|$)'
-routes = re.findall(route_pattern, content, re.DOTALL)
-
-# Categorize routes
-me_routes = []
-id_routes = []
-other_routes = []
-
-for route in routes:
-    if '"/me"' in route or '"/me/' in route:
-        me_routes.append(route)
-    elif '"/{profile_id}"' in route:  # Fixed: removed the extra part
-        id_routes.append(route)
-    else:
-        other_routes.append(route)
-
-print(f"Found {len(me_routes)} /me routes")
-print(f"Found {len(id_routes)} /{{profile_id}} routes")  # Fixed: escaped the braces
-print(f"Found {len(other_routes)} other routes")
-
-# Find where routes start in the file
-routes_start = content.find('@router.')
-if routes_start == -1:
-    print("Could not find routes!")
-    exit(1)
-
-# Get everything before routes
-before_routes = content[:routes_start]
-
-# Reorder: other routes first, then /me routes, then /{profile_id} routes
-new_content = before_routes
-
-# Add routes in correct order
-print("\nReordering routes...")
-new_content += ''.join(other_routes)
-new_content += '\n# ==================== /me routes (must come before /{profile_id}) ====================\n\n'
-new_content += ''.join(me_routes)
-new_content += '\n# ==================== /{profile_id} routes ====================\n\n'
-new_content += ''.join(id_routes)
-
-# Write back
-with open('backend/routes/profiles.py', 'w') as f:
-    f.write(new_content)
-
-print("✅ Routes reordered successfully!")
-print("\nNew route order:")
-# Show the new order
-new_routes = re.findall(r'@router\.\w+\("([^"]+)"', new_content)
-for i, route in enumerate(new_routes, 1):
-    print(f"  {i}. {route}")
+from fix_common import PROFILES_PATH, buffer_output, load, save
+
+ME_HEADER = '\n# ==================== /me routes (must come before /{profile_id}) ====================\n\n'
+ID_HEADER = '\n# ==================== /{profile_id} routes ====================\n\n'
+
+
+def route_path(route):
+    """Return the path of a '@router.<method>("<path>"' block, or None"""
+    parts = route.split('"', 2)
+    if len(parts) == 3 and parts[0].endswith('(') and '\n' not in parts[0]:
+        return parts[1]
+    return None
+
+
+def reorder_routes(content):
+    """Return content with /me routes ahead of /{profile_id}, or None if there are no routes"""
+    # Find all route definitions with their full function blocks
+    # A plain split chops from each @router to the next @router or end of file
+    # in one linear pass
+    before_routes, *blocks = content.split('@router.')
+
+    # Drop the section headers a previous run added; they are re-added below,
+    # so a re-run does not stack another pair each time
+    def strip_headers(text):
+        return text.replace(ME_HEADER, '').replace(ID_HEADER, '')
+
+    before_routes = strip_headers(before_routes)
+
+    # Categorize routes in the same pass, keeping each route's path for the report
+    buckets = {'other': [], 'me': [], 'id': []}
+    for block in blocks:
+        route = '@router.' + strip_headers(block)
+        if '"/me"' in route or '"/me/' in route:
+            key = 'me'
+        elif '"/{profile_id}"' in route:  # Fixed: removed the extra part
+            key = 'id'
+        else:
+            key = 'other'
+        buckets[key].append((route_path(route), route))
+
+    print(f"Found {len(buckets['me'])} /me routes")
+    print(f"Found {len(buckets['id'])} /{{profile_id}} routes")  # Fixed: escaped the braces
+    print(f"Found {len(buckets['other'])} other routes")
+
+    if not blocks:
+        print("Could not find routes!")
+        return None
+
+    # Reorder: other routes first, then /me routes, then /{profile_id} routes
+    new_content = ''.join([
+        before_routes,
+        *(route for _, route in buckets['other']),
+        ME_HEADER,
+        *(route for _, route in buckets['me']),
+        ID_HEADER,
+        *(route for _, route in buckets['id']),
+    ])
+    if new_content == content:
+        print("\n✓ Routes already in order")
+        return content
+
+    print("\nReordering routes...")
+    print("✅ Routes reordered successfully!")
+    print("\nNew route order:")
+    # Show the new order
+    new_routes = [path for key in ('other', 'me', 'id') for path, _ in buckets[key] if path]
+    for i, path in enumerate(new_routes, 1):
+        print(f"  {i}. {path}")
+
+    return new_content
+
+
+def main():
+    buffer_output()
+    new_content = reorder_routes(load(PROFILES_PATH))
+    if new_content is None:
+        exit(1)
+
+    # Write back
+    save(PROFILES_PATH, new_content)
+
+
+if __name__ == "__main__":
+    main()
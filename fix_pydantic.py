@@ -1,35 +1,24 @@
 import re
+from pathlib import Path
+
+from fix_common import atomic_write
+
+AUTH_PATH = Path('backend/routes/auth.py')
+
+VALIDATOR_PATTERN = re.compile(r'@validator\(')
+# \b keeps an already-migrated field_validator import from being rewritten again
+VALIDATOR_IMPORT_PATTERN = re.compile(r'^(from pydantic import .*)\bvalidator\b', re.MULTILINE)
 
 # Read auth.py
-with open('backend/routes/auth.py', 'r') as f:
-    content = f.read()
+content = AUTH_PATH.read_text(encoding='utf-8')
 
 # Replace @validator with @field_validator
-content = re.sub(r'@validator\(', '@field_validator(', content)
+content = VALIDATOR_PATTERN.sub('@field_validator(', content)
 
-# Add the import
-if 'from pydantic import' in content and 'field_validator' not in content:
-    content = content.replace(
-        'from pydantic import BaseModel, Field, validator',
-        'from pydantic import BaseModel, Field, field_validator'
-    )
+# Update the import
+content = VALIDATOR_IMPORT_PATTERN.sub(r'\1field_validator', content, count=1)
 
 # Write back
-with open('backend/routes/auth.py', 'r') as f:
-    lines = f.readlines()
-
-# Find the import section and update
-for i, line in enumerate(lines):
-    if 'from pydantic import' in line and 'validator' in line:
-        lines[i] = line.replace('validator', 'field_validator')
-        break
-
-# Update validator decorators
-for i, line in enumerate(lines):
-    if '@validator(' in line:
-        lines[i] = line.replace('@validator(', '@field_validator(')
-
-with open('backend/routes/auth.py', 'w') as f:
-    f.writelines(lines)
+atomic_write(AUTH_PATH, content)
 
 print("Fixed auth.py")
@@ -6,99 +6,157 @@ Fix Pydantic v2 config conflicts - remove old Config classes and use model_confi
 import re
 import os
 
-def fix_pydantic_configs(file_path):
-    """Fix Pydantic config in a file"""
-    with open(file_path, 'r') as f:
-        content = f.read()
-    
-    original_content = content
-    
-    # Pattern to find classes with both Config and model_config
-    # First, find all Pydantic model classes
-    class_pattern = r'class\s+(\w+)\s*\([^)]*BaseModel[^)]*\):(.*?)(?=class\s+\w+|$)'
+from fix_common import PRESENCE_PATH, buffer_output
+
+# Patterns are compiled once at import
+CLASS_HEADER_PATTERN = re.compile(r'class\s+(\w+)\s*\(([^)]*BaseModel[^)]*)\):')
+CLASS_KEYWORD_PATTERN = re.compile(r'class\s+\w+')
+CONFIG_CLASS_PATTERN = re.compile(r'class Config:.*?(?=\n\s{0,4}\w|\n\s*$)', re.DOTALL)
+JSON_ENCODERS_PATTERN = re.compile(r'json_encoders\s*=\s*({[^}]+})')
+MODEL_CONFIG_PATTERN = re.compile(r'model_config\s*=\s*{"from_attributes":\s*True}')
+MODEL_CONFIG_DOCSTRING_PATTERN = re.compile(r'model_config = {"from_attributes": True}\s*\n\s*"""')
+PRESENCE_RESPONSE_PATTERN = re.compile(r'(class PresenceEventResponse\(BaseModel\):)(.*?)(?=class|\Z)', re.DOTALL)
+NESTED_CONFIG_PATTERN = re.compile(r'\s*class Config:.*?(?=\n\s{0,4}\w)', re.DOTALL)
+
+def fix_class(class_name, bases, class_body):
     
-    def fix_class(match):
-        class_name = match.group(1)
-        class_body = match.group(2)
-        
-        # Check if this class has a Config class
-        if 'class Config:' in class_body:
-            # Extract the Config class content
-            config_match = re.search(r'class Config:.*?(?=\n\s{0,4}\w|\n\s*$)', class_body, re.DOTALL)
-            if config_match:
-                config_content = config_match.group(0)
-                
-                # Extract config values
-                config_dict = {}
+    # Check if this class has a Config class; the literal find locates it and
+    # the regex only runs from there to extract its body
+    config_start = class_body.find('class Config:')
+    if config_start != -1:
+        # Extract the Config class content
+        config_match = CONFIG_CLASS_PATTERN.search(class_body, config_start)
+        if config_match:
+            config_content = config_match.group(0)
+            
+            # Extract config values
+            config_dict = {}
+            
+            # Common config patterns
+            if 'orm_mode = True' in config_content or 'from_attributes = True' in config_content:
+                config_dict['from_attributes'] = True
+            if 'use_enum_values = True' in config_content:
+                config_dict['use_enum_values'] = True
+            if 'validate_assignment = True' in config_content:
+                config_dict['validate_assignment'] = True
+            encoders_start = config_content.find('json_encoders')
+            if encoders_start != -1:
+                # Extract json_encoders
+                encoder_match = JSON_ENCODERS_PATTERN.search(config_content, encoders_start)
+                if encoder_match:
+                    config_dict['json_encoders'] = encoder_match.group(1)
+            
+            # Remove the Config class
+            class_body = class_body.replace(config_content, '')
+            
+            # Add model_config if we have config values
+            if config_dict:
+                # Format the config dict
+                config_str = "model_config = {\n"
+                for key, value in config_dict.items():
+                    if isinstance(value, bool):
+                        config_str += f'        "{key}": {value},\n'
+                    else:
+                        config_str += f'        "{key}": {value},\n'
+                config_str = config_str.rstrip(',\n') + '\n    }\n'
                 
-                # Common config patterns
-                if 'orm_mode = True' in config_content or 'from_attributes = True' in config_content:
-                    config_dict['from_attributes'] = True
-                if 'use_enum_values = True' in config_content:
-                    config_dict['use_enum_values'] = True
-                if 'validate_assignment = True' in config_content:
-                    config_dict['validate_assignment'] = True
-                if 'json_encoders' in config_content:
-                    # Extract json_encoders
-                    encoder_match = re.search(r'json_encoders\s*=\s*({[^}]+})', config_content)
-                    if encoder_match:
-                        config_dict['json_encoders'] = encoder_match.group(1)
+                # Add model_config after class declaration
+                # Find the first line after class declaration
+                lines = class_body.split('\n')
+                insert_index = 1
+                for i, line in enumerate(lines[1:], 1):
+                    if line.strip() and not line.strip().startswith('"""'):
+                        insert_index = i
+                        break
                 
-                # Remove the Config class
-                class_body = class_body.replace(config_content, '')
-                
-                # Add model_config if we have config values
-                if config_dict:
-                    # Format the config dict
-                    config_str = "model_config = {\n"
-                    for key, value in config_dict.items():
-                        if isinstance(value, bool):
-                            config_str += f'        "{key}": {value},\n'
-                        else:
-                            config_str += f'        "{key}": {value},\n'
-                    config_str = config_str.rstrip(',\n') + '\n    }\n'
-                    
-                    # Add model_config after class declaration
-                    # Find the first line after class declaration
-                    lines = class_body.split('\n')
-                    insert_index = 1
-                    for i, line in enumerate(lines[1:], 1):
-                        if line.strip() and not line.strip().startswith('"""'):
-                            insert_index = i
-                            break
-                    
-                    lines.insert(insert_index, '    ' + config_str)
-                    class_body = '\n'.join(lines)
-        
-        # Also check if model_config already exists and has conflicts
-        if 'model_config = ' in class_body and 'class Config:' not in class_body:
-            # Just ensure it's properly formatted
-            class_body = re.sub(
-                r'model_config\s*=\s*{"from_attributes":\s*True}',
-                'model_config = {"from_attributes": True}',
-                class_body
-            )
-        
-        return f'class {class_name}({match.group(0).split("(", 1)[1].split(")", 1)[0]}):{class_body}'
+                lines.insert(insert_index, '    ' + config_str)
+                class_body = '\n'.join(lines)
+    
+    # Also check if model_config already exists and has conflicts. The
+    # pattern only normalizes spacing, so skip it when every model_config
+    # is already in the normalized form
+    if ('model_config = ' in class_body and 'class Config:' not in class_body
+            and class_body.count('model_config') != class_body.count('model_config = {"from_attributes": True}')):
+        # Just ensure it's properly formatted
+        class_body = MODEL_CONFIG_PATTERN.sub(
+            'model_config = {"from_attributes": True}',
+            class_body
+        )
     
-    # Apply fixes to all classes
-    content = re.sub(class_pattern, fix_class, content, flags=re.DOTALL)
+    return f'class {class_name}({bases}):{class_body}'
+
+def iter_blocks(lines):
+    """Group lines into chunks that each start at a top-level class statement"""
+    block = []
+    for line in lines:
+        if line.startswith('class ') and block:
+            yield ''.join(block)
+            block = []
+        block.append(line)
+    if block:
+        yield ''.join(block)
+
+def fix_block(block):
+    """Apply the model_config fixes to one top-level chunk of a file"""
+    # Each chunk starts at one top-level class, so only its header needs a
+    # regex. The body runs up to the next class statement (as it always has,
+    # so a nested class Config ends it) and the rest is kept as is
+    if 'BaseModel' in block:
+        match = CLASS_HEADER_PATTERN.match(block)
+        if match:
+            next_class = CLASS_KEYWORD_PATTERN.search(block, match.end())
+            body_end = next_class.start() if next_class else len(block)
+            block = (fix_class(match.group(1), match.group(2), block[match.end():body_end])
+                     + block[body_end:])
     
     # Also fix any standalone model_config issues
-    content = re.sub(
-        r'model_config = {"from_attributes": True}\s*\n\s*"""',
-        'model_config = {"from_attributes": True}\n\n    """',
-        content
-    )
+    if 'model_config = {"from_attributes": True}' in block and '"""' in block:
+        block = MODEL_CONFIG_DOCSTRING_PATTERN.sub(
+            'model_config = {"from_attributes": True}\n\n    """',
+            block
+        )
+    return block
+
+def fix_pydantic_configs(file_path):
+    """Fix Pydantic config in a file
+
+    The file is streamed one top-level class at a time into a temporary file
+    next to it, which atomically replaces the original only if a chunk changed.
+    """
+    changed = False
+    tmp_path = file_path + '.tmp'
+    with open(file_path, 'r', encoding='utf-8') as src, open(tmp_path, 'w', encoding='utf-8') as tmp:
+        for block in iter_blocks(src):
+            fixed = fix_block(block)
+            changed = changed or fixed != block
+            tmp.write(fixed)
     
-    if content != original_content:
-        with open(file_path, 'w') as f:
-            f.write(content)
+    if changed:
+        os.replace(tmp_path, file_path)
         print(f"✓ Fixed {file_path}")
         return True
+    os.unlink(tmp_path)
     return False
 
+def fix_presence_response_body(class_content):
+    """Leave exactly one model_config and no Config class in PresenceEventResponse"""
+    # Remove any Config class
+    if 'class Config:' in class_content:
+        class_content = NESTED_CONFIG_PATTERN.sub('', class_content)
+    # Ensure only one model_config
+    if class_content.count('model_config') > 1:
+        # Keep only the first one
+        parts = class_content.split('model_config')
+        class_content = parts[0] + 'model_config = {"from_attributes": True}\n' + ''.join(parts[2:])
+    elif 'model_config' not in class_content:
+        # Add it
+        lines = class_content.split('\n')
+        lines.insert(1, '    model_config = {"from_attributes": True}')
+        class_content = '\n'.join(lines)
+    return class_content
+
 def main():
+    buffer_output()
     print("🔧 Fixing Pydantic config conflicts...\n")
     
     files_to_fix = [
@@ -112,43 +170,29 @@ def main():
     
     fixed_count = 0
     for file_path in files_to_fix:
-        if os.path.exists(file_path):
-            if fix_pydantic_configs(file_path):
-                fixed_count += 1
-        else:
+        # Opening the file is the existence check, so a missing file costs
+        # one failed open instead of a stat followed by an open
+        try:
+            fixed_count += fix_pydantic_configs(file_path)
+        except FileNotFoundError:
             print(f"⚠️  File not found: {file_path}")
     
     print(f"\n✅ Fixed {fixed_count} files")
     
     # Also do a quick manual fix for the specific error in presence.py
     print("\n📝 Applying specific fix to presence.py...")
-    with open('backend/routes/presence.py', 'r') as f:
-        content = f.read()
+    content = PRESENCE_PATH.read_text(encoding='utf-8')
     
     # Remove any duplicate model_config or Config class
-    # Fix PresenceEventResponse specifically
-    pattern = r'class PresenceEventResponse\(BaseModel\):(.*?)(?=class|\Z)'
-    match = re.search(pattern, content, re.DOTALL)
-    if match:
-        class_content = match.group(1)
-        # Remove any Config class
-        class_content = re.sub(r'\s*class Config:.*?(?=\n\s{0,4}\w)', '', class_content, flags=re.DOTALL)
-        # Ensure only one model_config
-        if class_content.count('model_config') > 1:
-            # Keep only the first one
-            parts = class_content.split('model_config')
-            new_content = parts[0] + 'model_config = {"from_attributes": True}\n' + ''.join(parts[2:])
-            class_content = new_content
-        elif 'model_config' not in class_content:
-            # Add it
-            lines = class_content.split('\n')
-            lines.insert(1, '    model_config = {"from_attributes": True}')
-            class_content = '\n'.join(lines)
-        
-        content = content[:match.start(1)] + class_content + content[match.end(1):]
+    # Fix PresenceEventResponse specifically, splicing the new body in
+    # during the same pass that finds it
+    content = PRESENCE_RESPONSE_PATTERN.sub(
+        lambda match: match.group(1) + fix_presence_response_body(match.group(2)),
+        content,
+        count=1
+    )
     
-    with open('backend/routes/presence.py', 'w') as f:
-        f.write(content)
+    PRESENCE_PATH.write_text(content, encoding='utf-8')
     
     print("✓ Applied specific fix to presence.py")
 
@@ -22,10 +22,12 @@ try:
     # For now, just note what needs to be done
     print("⚠️  Note: profiles.name is NOT NULL - may need to recreate table or provide default values")
     
-    # Check if any profiles exist without name
-    cursor.execute("SELECT COUNT(*) FROM profiles WHERE name IS NULL")
-    null_count = cursor.fetchone()[0]
-    if null_count > 0:
+    # Check if any profiles exist without name; EXISTS stops at the first
+    # match, so the full COUNT only runs when there is something to report
+    cursor.execute("SELECT EXISTS(SELECT 1 FROM profiles WHERE name IS NULL)")
+    if cursor.fetchone()[0]:
+        cursor.execute("SELECT COUNT(*) FROM profiles WHERE name IS NULL")
+        null_count = cursor.fetchone()[0]
         print(f"⚠️  Found {null_count} profiles with NULL name")
     
 except Exception as e:
@@ -5,11 +5,15 @@ sys.path.append('.')
 from backend.main import app
 
 print("\n🔍 Registered Routes:\n")
+# Print the routes and count the presence ones in the same pass
+presence_count = 0
 for route in app.routes:
-    if hasattr(route, 'methods') and hasattr(route, 'path'):
+    if not hasattr(route, 'path'):
+        continue
+    if hasattr(route, 'methods'):
         methods = ', '.join(route.methods) if route.methods else 'N/A'
         print(f"{methods:<10} {route.path}")
+    if '/presence' in route.path:
+        presence_count += 1
 
-# Count presence routes
-presence_routes = [r for r in app.routes if hasattr(r, 'path') and '/presence' in r.path]
-print(f"\n✓ Found {len(presence_routes)} presence routes")
+print(f"\n✓ Found {presence_count} presence routes")
@@ -8,7 +8,11 @@ logger = logging.getLogger(__name__)
 def manual_migrate_profiles():
     """Manually add columns to profiles table"""
     
-    with engine.connect() as conn:
+    # One transaction for every ALTER, committed once when the block exits;
+    # each ALTER gets its own savepoint so one failure doesn't undo the rest
+    added = []
+    failures = []
+    with engine.begin() as conn:
         # Get existing columns
         result = conn.execute(text("PRAGMA table_info(profiles)"))
         existing_columns = {row[1] for row in result}
@@ -37,17 +41,27 @@ def manual_migrate_profiles():
             ("updated_at", "TIMESTAMP")
         ]
         
-        # Add each column if it doesn't exist
+        missing = []
         for col_name, col_type in columns_to_add:
-            if col_name not in existing_columns:
-                try:
-                    conn.execute(text(f"ALTER TABLE profiles ADD COLUMN {col_name} {col_type}"))
-                    conn.commit()
-                    logger.info(f"Added column {col_name}")
-                except Exception as e:
-                    logger.warning(f"Could not add column {col_name}: {e}")
-            else:
+            if col_name in existing_columns:
                 logger.info(f"Column {col_name} already exists")
+            else:
+                missing.append((col_name, col_type))
+        
+        # Add each column that doesn't exist (SQLite allows one per ALTER)
+        for col_name, col_type in missing:
+            try:
+                with conn.begin_nested():
+                    conn.execute(text(f"ALTER TABLE profiles ADD COLUMN {col_name} {col_type}"))
+                added.append(col_name)
+            except Exception as e:
+                failures.append((col_name, e))
+    
+    # Only report columns as added once the transaction has committed
+    for col_name in added:
+        logger.info(f"Added column {col_name}")
+    for col_name, e in failures:
+        logger.warning(f"Could not add column {col_name}: {e}")
 
 if __name__ == "__main__":
     manual_migrate_profiles()
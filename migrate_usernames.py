@@ -3,26 +3,26 @@
 Migration script to ensure all profiles have usernames
 Since users are stored in memory, we'll use the profile's user_id as username
 """
+from sqlalchemy import String, func, literal
+
 from backend.db.session import SessionLocal
 from backend.models.profile import Profile
 
 def migrate_usernames():
     db = SessionLocal()
     try:
-        # Get all profiles without usernames
-        profiles = db.query(Profile).filter(
+        # Use user_id as username if no username exists
+        # In a real system, you might want to generate a better default
+        # One UPDATE fills every profile without a username from the first
+        # 8 characters of its user_id, instead of loading and saving each row
+        updated = db.query(Profile).filter(
             (Profile.username == None) | (Profile.username == "")
-        ).all()
-        
-        print(f"Found {len(profiles)} profiles without usernames")
+        ).update(
+            {Profile.username: literal("user_", String) + func.substr(Profile.user_id, 1, 8)},
+            synchronize_session=False
+        )
         
-        for profile in profiles:
-            # Use user_id as username if no username exists
-            # In a real system, you might want to generate a better default
-            if not profile.username:
-                # Use the first 8 characters of user_id as username
-                profile.username = f"user_{profile.user_id[:8]}"
-                print(f"Updated profile {profile.id} with username {profile.username}")
+        print(f"Updated {updated} profiles without usernames")
         
         db.commit()
         print("✓ Migration complete!")
@@ -4,56 +4,48 @@ Perfect score fixes - ensure everything works correctly
 """
 
 import re
+from pathlib import Path
 
-print("🎯 Applying perfect score fixes...\n")
+from fix_common import PRESENCE_PATH, PROFILES_PATH, buffer_output, edit_file, save
 
-# 1. Fix the Profile model to ensure username is always synced
-print("1️⃣ Fixing Profile model to sync username...")
-with open('backend/models/profile.py', 'r') as f:
-    profile_model = f.read()
-
-# Ensure username field is defined
-if 'username = Column(String' not in profile_model:
-    # Add username field after user_id
-    profile_model = re.sub(
-        r'(user_id = Column\(String[^)]*\))',
-        r'\1\n    username = Column(String, nullable=True, index=True)',
-        profile_model
-    )
-    print("✓ Added username column to Profile model")
-
-with open('backend/models/profile.py', 'w') as f:
-    f.write(profile_model)
+# Patterns are compiled once at import
+USER_ID_COLUMN_PATTERN = re.compile(r'(user_id = Column\(String[^)]*\))')
+GET_MY_PROFILE_PATTERN = re.compile(r'(async def get_my_profile.*?)(profile = db\.query\(Profile\).*?if not profile:.*?)(profile = Profile\(.*?\).*?db\.add\(profile\).*?db\.commit\(.*?\))', re.DOTALL)
+PROFILE_CREATION_PATTERN = re.compile(r'profile = Profile\([^)]+\)[\s\S]*?db\.commit\(\)')
+STATUS_FUNCTION_PATTERN = re.compile(r'@router\.get\("/status/\{user_id\}"\)[\s\S]*?(?=@router\.|$)')
+# One alternative per status test edit, so the test file is scanned once
+STATUS_TEST_PATTERN = re.compile(
+    r'(?P<flexible_assert>assert response\.status_code in \[200, 404\].*)'
+    r'|(?P<maybe_404_comment># This might return 404.*\n)'
+    r'|(?P<optional_step_comment># 7\. Get user presence status \(optional.*\))'
+)
+STATUS_TEST_REPLACEMENTS = {
+    'flexible_assert': 'assert response.status_code == 200',
+    # Remove the comment about it being optional
+    'maybe_404_comment': '',
+    'optional_step_comment': '# 7. Get user presence status',
+}
 
-# 2. Fix the profile creation in routes to always get username from user
-print("\n2️⃣ Fixing profile creation to properly get username...")
-with open('backend/routes/profiles.py', 'r') as f:
-    routes_content = f.read()
+# Imported once at the top of the patched module instead of on every call;
+# guarded like backend/models/__init__.py because users may live in memory
+USER_IMPORT = '''
+# Import User if it exists
+try:
+    from backend.models.user import User
+except ImportError:
+    User = None
+'''
 
-# First, let's add a helper to get the actual user data
-helper_code = '''
+HELPER_CODE = '''
 async def get_user_data(user_id: str, db: Session):
     """Get user data from User table"""
-    from backend.models.user import User
+    if User is None:
+        return None
     user = db.query(User).filter(User.id == user_id).first()
     return user
 '''
 
-# Add the helper if it doesn't exist
-if 'async def get_user_data' not in routes_content:
-    # Add after imports
-    import_end = routes_content.find('\nrouter = APIRouter')
-    if import_end > 0:
-        routes_content = routes_content[:import_end] + '\n' + helper_code + routes_content[import_end:]
-        print("✓ Added get_user_data helper")
-
-# Now fix the get_my_profile function
-pattern = r'(async def get_my_profile.*?)(profile = db\.query\(Profile\).*?if not profile:.*?)(profile = Profile\(.*?\).*?db\.add\(profile\).*?db\.commit\(.*?\))'
-match = re.search(pattern, routes_content, re.DOTALL)
-
-if match:
-    # Replace the profile creation part
-    new_creation = '''# Get the actual user data for username
+NEW_CREATION = '''# Get the actual user data for username
         user = await get_user_data(current_user["id"], db)
         username = user.username if user else current_user.get("username", current_user["id"][:8])
         
@@ -68,22 +60,8 @@ if match:
         )
         db.add(profile)
         db.commit()'''
-    
-    # Find and replace the profile creation section
-    creation_pattern = r'profile = Profile\([^)]+\)[\s\S]*?db\.commit\(\)'
-    routes_content = re.sub(creation_pattern, new_creation, routes_content)
-    print("✓ Fixed profile creation to include username")
-
-with open('backend/routes/profiles.py', 'w') as f:
-    f.write(routes_content)
-
-# 3. Fix the presence status endpoint to work correctly
-print("\n3️⃣ Fixing presence status endpoint...")
-with open('backend/routes/presence.py', 'r') as f:
-    presence_content = f.read()
 
-# Find and update the get_user_presence_status function
-status_function = '''@router.get("/status/{user_id}")
+STATUS_FUNCTION = '''@router.get("/status/{user_id}")
 async def get_user_presence_status(
     user_id: str,
     include_location: bool = Query(True, description="Include sensor-based location"),
@@ -113,10 +91,11 @@ async def get_user_presence_status(
     
     if not profile:
         # Try to find the user directly
-        from backend.models.user import User
-        user = db.query(User).filter(
-            (User.username == user_id) | (User.id == user_id)
-        ).first()
+        user = None
+        if User is not None:
+            user = db.query(User).filter(
+                (User.username == user_id) | (User.id == user_id)
+            ).first()
         
         if user:
             # Create a minimal profile response
@@ -168,51 +147,13 @@ async def get_user_presence_status(
         confidence=location_confidence
     )'''
 
-# Replace the function
-function_pattern = r'@router\.get\("/status/\{user_id\}"\)[\s\S]*?(?=@router\.|$)'
-presence_content = re.sub(function_pattern, status_function + '\n\n', presence_content)
-
-with open('backend/routes/presence.py', 'w') as f:
-    f.write(presence_content)
-
-print("✓ Fixed presence status endpoint")
-
-# 4. Revert the test to expect 200 status
-print("\n4️⃣ Reverting test to expect proper 200 status...")
-with open('tests/test_integration.py', 'r') as f:
-    test_content = f.read()
 
-# Change back to expect 200
-test_content = re.sub(
-    r'assert response\.status_code in \[200, 404\].*',
-    'assert response.status_code == 200',
-    test_content
-)
-
-# Remove the comment about it being optional
-test_content = re.sub(
-    r'# This might return 404.*\n',
-    '',
-    test_content
-)
-
-test_content = re.sub(
-    r'# 7\. Get user presence status \(optional.*\)',
-    '# 7. Get user presence status',
-    test_content
-)
-
-with open('tests/test_integration.py', 'w') as f:
-    f.write(test_content)
-
-print("✓ Reverted test to expect 200 status")
-
-# 5. Create a migration script to update existing profiles
-print("\n5️⃣ Creating migration script for existing data...")
-migration_script = '''#!/usr/bin/env python3
+MIGRATION_SCRIPT = '''#!/usr/bin/env python3
 """
 Migration script to ensure all profiles have usernames
 """
+from sqlalchemy import select
+
 from backend.db.session import SessionLocal
 from backend.models.profile import Profile
 from backend.models.user import User
@@ -220,19 +161,18 @@ from backend.models.user import User
 def migrate_usernames():
     db = SessionLocal()
     try:
-        # Get all profiles without usernames
-        profiles = db.query(Profile).filter(
-            (Profile.username == None) | (Profile.username == "")
-        ).all()
-        
-        print(f"Found {len(profiles)} profiles without usernames")
+        # Copy each user's username onto their profile in one UPDATE with a
+        # correlated subquery, instead of one User lookup per profile
+        user_match = User.id == Profile.user_id
+        updated = db.query(Profile).filter(
+            (Profile.username == None) | (Profile.username == ""),
+            select(User.id).where(user_match).exists()
+        ).update(
+            {Profile.username: select(User.username).where(user_match).scalar_subquery()},
+            synchronize_session=False
+        )
         
-        for profile in profiles:
-            # Get the user
-            user = db.query(User).filter(User.id == profile.user_id).first()
-            if user:
-                profile.username = user.username
-                print(f"Updated profile {profile.id} with username {user.username}")
+        print(f"Updated {updated} profiles without usernames")
         
         db.commit()
         print("✓ Migration complete!")
@@ -247,20 +187,115 @@ if __name__ == "__main__":
     migrate_usernames()
 '''
 
-with open('migrate_usernames.py', 'w') as f:
-    f.write(migration_script)
-
-print("✓ Created migration script")
-
-print("\n✅ All perfect score fixes applied!")
-print("\n📋 Summary of changes:")
-print("1. Profile model now has username column with index")
-print("2. Profile creation properly syncs username from User")
-print("3. Presence status endpoint handles all lookup methods")
-print("4. Tests expect proper 200 responses")
-print("5. Migration script available for existing data")
-print("\n🚀 Next steps:")
-print("1. Run migration (if you have existing data): python migrate_usernames.py")
-print("2. Restart your server")
-print("3. Run tests: pytest tests/ -v")
-print("\n🎉 All tests should pass with flying colors!")
\ No newline at end of file
+
+def add_username_column(profile_model):
+    """Ensure username field is defined"""
+    if 'username = Column(String' not in profile_model:
+        # Add username field after user_id
+        profile_model = USER_ID_COLUMN_PATTERN.sub(
+            r'\1\n    username = Column(String, nullable=True, index=True)',
+            profile_model
+        )
+        print("✓ Added username column to Profile model")
+    return profile_model
+
+
+def add_user_import(content):
+    """Add the guarded User import after the imports if it isn't there yet"""
+    if USER_IMPORT.strip() not in content:
+        import_end = content.find('\nrouter = APIRouter')
+        if import_end > 0:
+            content = content[:import_end] + USER_IMPORT + content[import_end:]
+    return content
+
+
+def add_user_data_helper(routes_content):
+    """Add the get_user_data helper if it doesn't exist"""
+    if 'async def get_user_data' not in routes_content:
+        # Add after imports
+        import_end = routes_content.find('\nrouter = APIRouter')
+        if import_end > 0:
+            routes_content = routes_content[:import_end] + '\n' + HELPER_CODE + routes_content[import_end:]
+            routes_content = add_user_import(routes_content)
+            print("✓ Added get_user_data helper")
+    return routes_content
+
+
+def fix_profile_creation(routes_content):
+    """Fix the get_my_profile function to get the username from the user"""
+    # NEW_CREATION still matches PROFILE_CREATION_PATTERN, so only apply it once
+    if 'user = await get_user_data(' in routes_content:
+        return routes_content
+    if GET_MY_PROFILE_PATTERN.search(routes_content):
+        # Find and replace the profile creation section
+        routes_content = PROFILE_CREATION_PATTERN.sub(NEW_CREATION, routes_content)
+        print("✓ Fixed profile creation to include username")
+    return routes_content
+
+
+def replace_status_function(presence_content):
+    """Replace the get_user_presence_status function"""
+    presence_content, replaced = STATUS_FUNCTION_PATTERN.subn(STATUS_FUNCTION + '\n\n', presence_content)
+    if replaced:
+        presence_content = add_user_import(presence_content)
+    print("✓ Fixed presence status endpoint")
+    return presence_content
+
+
+def revert_status_test(test_content):
+    """Change the presence status test back to expect 200"""
+    test_content = STATUS_TEST_PATTERN.sub(
+        lambda match: STATUS_TEST_REPLACEMENTS[match.lastgroup],
+        test_content
+    )
+
+    print("✓ Reverted test to expect 200 status")
+    return test_content
+
+
+def main():
+    buffer_output()
+    print("🎯 Applying perfect score fixes...\n")
+
+    # Each file is read once, every edit for it is applied in memory, and it is
+    # written once (and only if something changed)
+
+    # 1. Fix the Profile model to ensure username is always synced
+    print("1️⃣ Fixing Profile model to sync username...")
+    edit_file(Path('backend/models/profile.py'), add_username_column)
+
+    # 2. Fix the profile creation in routes to always get username from user
+    print("\n2️⃣ Fixing profile creation to properly get username...")
+    edit_file(PROFILES_PATH, add_user_data_helper, fix_profile_creation)
+
+    # 3. Fix the presence status endpoint to work correctly
+    print("\n3️⃣ Fixing presence status endpoint...")
+    edit_file(PRESENCE_PATH, replace_status_function)
+
+    # 4. Revert the test to expect 200 status
+    print("\n4️⃣ Reverting test to expect proper 200 status...")
+    edit_file(Path('tests/test_integration.py'), revert_status_test)
+
+    # 5. Create a migration script to update existing profiles
+    print("\n5️⃣ Creating migration script for existing data...")
+    if save(Path('migrate_usernames.py'), MIGRATION_SCRIPT):
+        print("✓ Created migration script")
+    else:
+        print("✓ Migration script already up to date")
+
+    print("\n✅ All perfect score fixes applied!")
+    print("\n📋 Summary of changes:")
+    print("1. Profile model now has username column with index")
+    print("2. Profile creation properly syncs username from User")
+    print("3. Presence status endpoint handles all lookup methods")
+    print("4. Tests expect proper 200 responses")
+    print("5. Migration script available for existing data")
+    print("\n🚀 Next steps:")
+    print("1. Run migration (if you have existing data): python migrate_usernames.py")
+    print("2. Restart your server")
+    print("3. Run tests: pytest tests/ -v")
+    print("\n🎉 All tests should pass with flying colors!")
+
+
+if __name__ == "__main__":
+    main()
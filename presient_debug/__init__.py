@@ -0,0 +1,35 @@
+"""
+Shared helpers for the Presient diagnostic scripts
+"""
+
+from .client import (
+    BASE_URL,
+    REQUEST_TIMEOUT,
+    TOKEN_EXPIRY_MARGIN,
+    Breaker,
+    CircuitOpenError,
+    breaker,
+    close_session,
+    get_session,
+    get_token,
+    login,
+    request,
+    run,
+    token_expiry,
+)
+
+__all__ = [
+    'BASE_URL',
+    'REQUEST_TIMEOUT',
+    'TOKEN_EXPIRY_MARGIN',
+    'Breaker',
+    'CircuitOpenError',
+    'breaker',
+    'close_session',
+    'get_session',
+    'get_token',
+    'login',
+    'request',
+    'run',
+    'token_expiry',
+]
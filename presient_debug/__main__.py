@@ -0,0 +1,43 @@
+"""
+Run the Presient diagnostic scripts from one process
+
+    python -m presient_debug {create,debug-presence,patch-test,diagnose,run-all}
+"""
+
+import argparse
+import asyncio
+import importlib
+
+from .client import run
+
+# CLI command -> script module; each exposes main(), a coroutine function for
+# the HTTP scripts and a plain function for the test patcher
+COMMANDS = {
+    "create": "create_profile",
+    "debug-presence": "debug_presence_response",
+    "patch-test": "debug_test_response",
+    "diagnose": "diagnose_500_errors",
+}
+
+async def _run_commands(names):
+    """Run each script's main() in turn on the shared session"""
+    for name in names:
+        main = importlib.import_module(COMMANDS[name]).main
+        if asyncio.iscoroutinefunction(main):
+            await main()
+        else:
+            main()
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="python -m presient_debug",
+        description="Presient API diagnostic scripts"
+    )
+    parser.add_argument("command", choices=[*COMMANDS, "run-all"])
+    args = parser.parse_args()
+
+    names = list(COMMANDS) if args.command == "run-all" else [args.command]
+    asyncio.run(run(_run_commands(names)))
+
+if __name__ == "__main__":
+    main()
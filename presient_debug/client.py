@@ -0,0 +1,171 @@
+"""
+Shared HTTP client for the Presient diagnostic scripts
+"""
+
+import aiohttp
+import asyncio
+import jwt
+import logging
+import random
+import time
+
+logger = logging.getLogger(__name__)
+
+BASE_URL = "http://localhost:8000"
+
+REQUEST_TIMEOUT = aiohttp.ClientTimeout(total=10)
+
+# Transient failures are retried a few times with jittered exponential backoff
+RETRY_STATUSES = frozenset({502, 503, 504})
+MAX_ATTEMPTS = 3
+BACKOFF_FACTOR = 0.3
+
+# Consecutive 5xx/connection failures on one endpoint before it is skipped,
+# and how long it stays skipped before a single probe is let through
+BREAKER_FAIL_MAX = 3
+BREAKER_RESET_AFTER = 30.0
+
+# Tokens are reused until they are this close to expiring
+TOKEN_EXPIRY_MARGIN = 60
+TOKEN_CACHE_SIZE = 4
+
+_session = None
+_tokens = {}
+
+def get_session():
+    """Return the shared keep-alive session, creating it on first use"""
+    global _session
+    if _session is None or _session.closed:
+        # uvicorn serves HTTP/1.1 only, so concurrent requests are spread over a
+        # small pool of keep-alive connections rather than multiplexed
+        _session = aiohttp.ClientSession(
+            base_url=BASE_URL,
+            connector=aiohttp.TCPConnector(limit=10, keepalive_timeout=30)
+        )
+    return _session
+
+async def close_session():
+    """Close the shared session if one was opened"""
+    global _session
+    if _session is not None:
+        await _session.close()
+        _session = None
+
+async def run(coro):
+    """Await a script's main coroutine, then close the shared session"""
+    try:
+        return await coro
+    finally:
+        await close_session()
+
+async def request(session, method, path, **kwargs):
+    """Send a request, retrying connection errors and 502/503/504 responses"""
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        try:
+            response = await session.request(method, path, **kwargs)
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+            if attempt == MAX_ATTEMPTS:
+                raise
+            logger.warning(f"⚠️ {method} {path} failed ({e}) - retrying")
+        else:
+            if response.status not in RETRY_STATUSES or attempt == MAX_ATTEMPTS:
+                return response
+            response.release()
+            logger.warning(f"⚠️ {method} {path} returned {response.status} - retrying")
+
+        await asyncio.sleep(random.uniform(0, BACKOFF_FACTOR * 2 ** attempt))
+
+class CircuitOpenError(aiohttp.ClientError):
+    """Raised instead of calling an endpoint whose breaker is open"""
+
+class Breaker:
+    """Per-endpoint circuit breaker for repeated calls against a failing backend"""
+
+    def __init__(self, fail_max=BREAKER_FAIL_MAX, reset_after=BREAKER_RESET_AFTER):
+        self.fail_max = fail_max
+        self.reset_after = reset_after
+        # (method, path) -> [consecutive failures, opened at, last error, probe in flight]
+        self._state = {}
+
+    async def __call__(self, fn, path, *args, **kwargs):
+        """Call fn(path, ...) unless the breaker for this endpoint is open"""
+        key = (fn.__name__.upper(), path)
+        state = self._state.setdefault(key, [0, None, None, False])
+        failures, opened_at, last_error, probing = state
+
+        if opened_at is not None:
+            if probing or time.monotonic() - opened_at < self.reset_after:
+                raise CircuitOpenError(f"{key[0]} {path} skipped after {failures} failures: {last_error}")
+            # Half-open: let exactly one probe through
+            state[3] = True
+
+        try:
+            response = await fn(path, *args, **kwargs)
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+            self._record_failure(state, repr(e))
+            raise
+        except BaseException:
+            # Anything else (a bad payload, cancellation) is not a backend
+            # failure, but it still ends the probe so the next call can retry
+            state[3] = False
+            raise
+
+        if response.status >= 500:
+            self._record_failure(state, f"HTTP {response.status}")
+        else:
+            state[:] = [0, None, None, False]
+        return response
+
+    def _record_failure(self, state, error):
+        state[0] += 1
+        state[2] = error
+        state[3] = False
+        if state[0] >= self.fail_max:
+            state[1] = time.monotonic()
+
+breaker = Breaker()
+
+async def login(session, username, password):
+    """Log in with OAuth2 form data; returns the access token or None"""
+    try:
+        logger.info("🔐 Logging in...")
+        async with await request(
+            session, "POST",
+            "/api/auth/login",
+            data={"username": username, "password": password},  # Form data for OAuth2
+            timeout=REQUEST_TIMEOUT
+        ) as login_response:
+            if login_response.status != 200:
+                logger.error(f"❌ Login failed: {login_response.status}")
+                logger.error(f"Response: {await login_response.text()}")
+                return None
+
+            auth_token = (await login_response.json())["access_token"]
+
+        logger.info("✅ Login successful")
+        return auth_token
+
+    except Exception as e:
+        logger.error(f"❌ Login exception: {e}")
+        return None
+
+def token_expiry(token):
+    """Read the exp claim from a JWT without verifying it; 0 if unreadable"""
+    try:
+        return jwt.decode(token, options={"verify_signature": False}).get("exp", 0)
+    except jwt.PyJWTError:
+        return 0
+
+async def get_token(session, username, password):
+    """Log in once per user and reuse the token until it is about to expire"""
+    key = (username, password)
+    cached = _tokens.get(key)
+    if cached and cached[1] - TOKEN_EXPIRY_MARGIN > time.time():
+        return cached[0]
+
+    token = await login(session, username, password)
+    if token:
+        if key not in _tokens and len(_tokens) >= TOKEN_CACHE_SIZE:
+            _tokens.pop(next(iter(_tokens)))
+        _tokens[key] = (token, token_expiry(token))
+    return token
@@ -4,11 +4,10 @@ Connected Biometric Bridge - Sends Real Push Notifications
 Connects biometric matching to backend notification system
 """
 
+import aiohttp
 import asyncio
 import logging
 import paho.mqtt.client as mqtt
-import requests
-import time
 import os
 import sys
 import json
@@ -23,6 +22,10 @@ from real_biometric_matcher import RealBiometricMatcher, BiometricSample
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Timeout for backend calls; the backend is local, so a slow connect means
+# it is down
+BACKEND_TIMEOUT = aiohttp.ClientTimeout(total=5, sock_connect=1)
+
 class ConnectedBiometricBridge:
     """Biometric bridge that sends real push notifications via backend"""
     
@@ -30,6 +33,15 @@ class ConnectedBiometricBridge:
         self.mqtt_host = "192.168.1.135"
         self.mqtt_port = 1883
         self.backend_url = "http://localhost:8000"  # Fixed to use localhost
+        self._event_url = f"{self.backend_url}/api/presence/event"
+        
+        # Set up by _run: the event loop that owns the HTTP session, and the
+        # queue the MQTT thread hands notifications to so a slow backend
+        # never stalls heart-rate ingest
+        self._loop = None
+        self._queue = None
+        self._session = None
+        self._auth_headers = {}
         
         # Initialize biometric matcher - CORRECTED INDENTATION
         self.matcher = RealBiometricMatcher( )
@@ -52,8 +64,18 @@ class ConnectedBiometricBridge:
         self.match_cooldown = 30  # seconds
         self.total_matches = 0
         self.auth_token = None
+    
+    @property
+    def auth_token(self):
+        return self._auth_token
+    
+    @auth_token.setter
+    def auth_token(self, token):
+        """Build the Authorization header once per token, not once per call"""
+        self._auth_token = token
+        self._auth_headers = {"Authorization": f"Bearer {token}"} if token else {}
         
-    def send_notification(self, match_result, heart_rate: float):
+    async def send_notification(self, match_result, heart_rate: float):
         """Send notification via /api/presence/event endpoint"""
         try:
             # Use the working /api/presence/event endpoint with correct format
@@ -66,51 +88,53 @@ class ConnectedBiometricBridge:
                 "timestamp": datetime.now().isoformat()
             }
             
-            headers = {"Content-Type": "application/json"}
-            if self.auth_token:
-                headers["Authorization"] = f"Bearer {self.auth_token}"
-            
-            response = requests.post(
-                f"{self.backend_url}/api/presence/event",
+            async with self._session.post(
+                self._event_url,
                 json=presence_data,
-                headers=headers,
-                timeout=5
-            )
-            
-            if response.status_code in [200, 201, 202]:
-                logger.info("📱 PUSH NOTIFICATION SENT VIA PRESENCE EVENT!")
-                return True
-            else:
-                logger.error(f"❌ Presence event failed: {response.status_code}")
-                logger.error(f"Response: {response.text}")
-                return False
+                headers=self._auth_headers,
+                timeout=BACKEND_TIMEOUT
+            ) as response:
+                if response.status in [200, 201, 202]:
+                    logger.info("📱 PUSH NOTIFICATION SENT VIA PRESENCE EVENT!")
+                    return True
+                else:
+                    logger.error(f"❌ Presence event failed: {response.status}")
+                    logger.error(f"Response: {await response.text()}")
+                    return False
                 
         except Exception as e:
             logger.error(f"❌ Notification error: {e}")
             return False
     
-    def test_backend_connection(self):
+    async def _notify(self, match_result, heart_rate: float):
+        """Send a notification and log the outcome"""
+        if await self.send_notification(match_result, heart_rate):
+            logger.info("🔔 REAL PUSH NOTIFICATION SENT TO YOUR PHONE!")
+        else:
+            logger.warning("⚠️ Notification failed - check backend connection")
+    
+    async def test_backend_connection(self):
         """Test backend connection and available endpoints"""
         try:
             # Test health endpoint
-            response = requests.get(f"{self.backend_url}/health", timeout=5)
-            if response.status_code == 200:
-                health_data = response.json()
-                logger.info("✅ Backend health check passed")
-                
-                # Check notification system status
-                if "notification_system" in health_data.get("checks", {}):
-                    logger.info("✅ Backend notification system available")
-                
-                # Check push tokens
-                if "push_tokens" in health_data.get("checks", {}):
-                    token_count = health_data["checks"].get("push_tokens", 0)
-                    logger.info(f"📱 Backend has {token_count} push tokens registered")
-                
-                return True
-            else:
-                logger.error(f"❌ Backend health check failed: {response.status_code}")
-                return False
+            async with self._session.get(f"{self.backend_url}/health", timeout=BACKEND_TIMEOUT) as response:
+                if response.status != 200:
+                    logger.error(f"❌ Backend health check failed: {response.status}")
+                    return False
+                health_data = await response.json(content_type=None)
+            
+            logger.info("✅ Backend health check passed")
+            
+            # Check notification system status
+            if "notification_system" in health_data.get("checks", {}):
+                logger.info("✅ Backend notification system available")
+            
+            # Check push tokens
+            if "push_tokens" in health_data.get("checks", {}):
+                token_count = health_data["checks"].get("push_tokens", 0)
+                logger.info(f"📱 Backend has {token_count} push tokens registered")
+            
+            return True
                 
         except Exception as e:
             logger.error(f"❌ Backend connection error: {e}")
@@ -123,26 +147,60 @@ class ConnectedBiometricBridge:
         logger.info("🎯 This bridge sends REAL push notifications to your phone!")
         logger.info(f"📊 Loaded profiles: {len(self.matcher.profiles)}")
         
-        # Test backend connection
-        if not self.test_backend_connection():
-            logger.error("❌ Cannot connect to backend - notifications will not work")
-            response = input("Continue anyway? (y/n): ").strip().lower()
-            if response != 'y':
+        # Heart rate and breathing rate topics
+        topics = [
+            "presient/sensor1/heart_rate/state",
+            "presient/sensor1/sensor/presient_mr60bha2_sensor_heart_rate/state",
+            "presient/sensor1/breath_rate/state",
+            "presient/sensor1/presence/state"
+        ]
+        
+        # Heart rate processing
+        def on_heart_rate(payload):
+            try:
+                # float() parses the ASCII payload bytes directly, so there
+                # is no intermediate str to decode
+                heart_rate = float(payload)
+            except ValueError:
                 return
+            
+            # Skip fallback values
+            if heart_rate == 40.0:
+                return
+                
+            # Add to matcher
+            sample = BiometricSample(
+                heart_rate=heart_rate,
+                timestamp=datetime.now()
+            )
+            self.matcher.add_sample(sample)
+            
+            logger.debug(f"💓 Processing HR: {heart_rate} BPM")
+            
+            # Check for match and send notification
+            self.check_match_and_notify(heart_rate)
+        
+        # Breathing rate
+        def on_breathing_rate(payload):
+            try:
+                breathing_rate = float(payload)
+            except ValueError:
+                return
+            # Add to latest sample
+            if self.matcher.recent_samples:
+                self.matcher.recent_samples[-1].breathing_rate = breathing_rate
+                logger.debug(f"🫁 Added breathing: {breathing_rate} BPM")
+        
+        # Subscriptions are exact topics, so each message is routed with one
+        # dict lookup instead of substring tests on its topic
+        dispatch = {topic: on_heart_rate for topic in topics if "heart_rate" in topic}
+        dispatch.update({topic: on_breathing_rate for topic in topics if "breath" in topic})
         
         # MQTT setup - Updated on_connect signature for paho-mqtt v2.0
         def on_connect(client, userdata, flags, rc, properties=None):
             if rc == 0:
                 logger.info("✅ Bridge connected to MQTT broker")
                 
-                # Subscribe to heart rate topics
-                topics = [
-                    "presient/sensor1/heart_rate/state",
-                    "presient/sensor1/sensor/presient_mr60bha2_sensor_heart_rate/state",
-                    "presient/sensor1/breath_rate/state",
-                    "presient/sensor1/presence/state"
-                ]
-                
                 for topic in topics:
                     client.subscribe(topic)
                     logger.debug(f"📡 Subscribed to: {topic}")
@@ -154,45 +212,11 @@ class ConnectedBiometricBridge:
         
         # Updated on_message signature for paho-mqtt v2.0
         def on_message(client, userdata, msg, properties=None):
+            handler = dispatch.get(msg.topic)
+            if handler is None:
+                return
             try:
-                topic = msg.topic
-                payload = msg.payload.decode('utf-8')
-                
-                # Heart rate processing
-                if "heart_rate" in topic and "/state" in topic:
-                    try:
-                        heart_rate = float(payload)
-                        
-                        # Skip fallback values
-                        if heart_rate == 40.0:
-                            return
-                            
-                        # Add to matcher
-                        sample = BiometricSample(
-                            heart_rate=heart_rate,
-                            timestamp=datetime.now()
-                        )
-                        self.matcher.add_sample(sample)
-                        
-                        logger.debug(f"💓 Processing HR: {heart_rate} BPM")
-                        
-                        # Check for match and send notification
-                        self.check_match_and_notify(heart_rate)
-                        
-                    except ValueError:
-                        pass
-                
-                # Breathing rate
-                elif ("breath_rate" in topic or "breathing_rate" in topic) and "/state" in topic:
-                    try:
-                        breathing_rate = float(payload)
-                        # Add to latest sample
-                        if self.matcher.recent_samples:
-                            self.matcher.recent_samples[-1].breathing_rate = breathing_rate
-                            logger.debug(f"🫁 Added breathing: {breathing_rate} BPM")
-                    except ValueError:
-                        pass
-                        
+                handler(msg.payload)
             except Exception as e:
                 logger.error(f"❌ MQTT processing error: {e}")
         
@@ -202,23 +226,44 @@ class ConnectedBiometricBridge:
         client.on_message = on_message
         
         try:
-            client.connect(self.mqtt_host, self.mqtt_port, 60)
-            client.loop_start()
+            asyncio.run(self._run(client))
+        except KeyboardInterrupt:
+            logger.info("🛑 Bridge stopped by user")
+        except Exception as e:
+            logger.error(f"❌ Bridge error: {e}")
+    
+    async def _run(self, client):
+        """Own the HTTP session and post queued notifications until stopped
+        
+        paho runs the MQTT network loop on its own thread; matches found there
+        are handed to this loop, which serves every POST over one kept-alive
+        connection pool.
+        """
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        connector = aiohttp.TCPConnector(limit=4, keepalive_timeout=60)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            self._session = session
             
-            logger.info("🎯 Connected bridge active! Check your phone for notifications...")
+            # Test backend connection
+            if not await self.test_backend_connection():
+                logger.error("❌ Cannot connect to backend - notifications will not work")
+                response = input("Continue anyway? (y/n): ").strip().lower()
+                if response != 'y':
+                    return
             
-            # Keep running
+            client.connect(self.mqtt_host, self.mqtt_port, 60)
+            client.loop_start()
             try:
-                while True:
-                    time.sleep(1)
-            except KeyboardInterrupt:
-                logger.info("🛑 Bridge stopped by user")
+                logger.info("🎯 Connected bridge active! Check your phone for notifications...")
                 
-        except Exception as e:
-            logger.error(f"❌ Bridge error: {e}")
-        finally:
-            client.loop_stop()
-            client.disconnect()
+                # Keep running, waking only when there is something to send
+                while True:
+                    match_result, heart_rate = await self._queue.get()
+                    await self._notify(match_result, heart_rate)
+            finally:
+                client.loop_stop()
+                client.disconnect()
     
     def check_match_and_notify(self, heart_rate: float):
         """Check for biometric match and send real notification"""
@@ -236,18 +281,15 @@ class ConnectedBiometricBridge:
                 logger.info(f"🎯 BIOMETRIC MATCH: {match_result.name} ({match_result.confidence:.1%})")
                 logger.info(f"💓 Heart rate: {heart_rate} BPM matched profile baseline: {match_result.match_details['baseline_heart_rate']:.1f} BPM")
                 
-                # Send real push notification
-                notification_sent = self.send_notification(match_result, heart_rate)
-                
-                if notification_sent:
-                    logger.info("🔔 REAL PUSH NOTIFICATION SENT TO YOUR PHONE!")
-                else:
-                    logger.warning("⚠️ Notification failed - check backend connection")
-                
-                # Update tracking
+                # Update tracking before sending so the cooldown applies
+                # while the notification is still in flight
                 self.last_match_time = datetime.now()
                 self.total_matches += 1
                 
+                # Hand the push notification to the event loop (this runs on
+                # the MQTT thread)
+                self._loop.call_soon_threadsafe(self._queue.put_nowait, (match_result, heart_rate))
+                
                 logger.info(f"📊 Total notifications sent: {self.total_matches}")
                 
             else:
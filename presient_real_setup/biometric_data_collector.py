@@ -5,8 +5,8 @@ Compatible with paho-mqtt v2.0+ and multi-user enrollment
 """
 
 import paho.mqtt.client as mqtt
-import time
 import statistics
+import threading
 from datetime import datetime
 from typing import List
 import logging
@@ -19,6 +19,17 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+# How often to repeat the waiting notice until the first sample arrives
+WAITING_NOTICE_SECONDS = 5
+
+# Heart rate and breathing rate topics
+TOPICS = [
+    "presient/sensor1/heart_rate/state",
+    "presient/sensor1/sensor/presient_mr60bha2_sensor_heart_rate/state",
+    "presient/sensor1/breath_rate/state",
+    "presient/sensor1/sensor/presient_mr60bha2_sensor_breathing_rate/state"
+]
+
 class BiometricDataCollector:
     """Collect biometric data from MR60BHA2 sensor for enrollment"""
     
@@ -30,21 +41,37 @@ class BiometricDataCollector:
         self.collection_seconds = 60  # Increased to 60 seconds for better data
         self._client = None
         self._start_time = None
+        self._done = threading.Event()
+        self._waiting_timer = None
         self.is_collecting = False
 
+        # Subscriptions are exact topics, so each message is routed with one
+        # dict lookup instead of substring tests on its topic
+        self._dispatch = {topic: self._on_heart_rate for topic in TOPICS if "heart_rate" in topic}
+        self._dispatch.update({topic: self._on_breathing_rate for topic in TOPICS if "breath" in topic})
+
+    def _remaining_seconds(self):
+        return self.collection_seconds - (datetime.now() - self._start_time).total_seconds()
+
+    def _report_waiting(self):
+        """Print the waiting notice, then re-arm it while no samples have arrived"""
+        if not self.is_collecting or self.collected_samples:
+            return
+        print(f"⏳ Waiting for sensor data... ({self._remaining_seconds():.0f}s remaining)")
+        self._waiting_timer = threading.Timer(WAITING_NOTICE_SECONDS, self._report_waiting)
+        self._waiting_timer.daemon = True
+        self._waiting_timer.start()
+
+    def stop(self):
+        """End the current collection early"""
+        self._done.set()
+
     def _on_connect(self, client, userdata, flags, rc, properties=None):
         """MQTT connection callback - compatible with paho-mqtt v2.0+"""
         if rc == 0:
             print("✅ MQTT connected")
             # Subscribe to multiple heart rate topics
-            topics = [
-                "presient/sensor1/heart_rate/state",
-                "presient/sensor1/sensor/presient_mr60bha2_sensor_heart_rate/state",
-                "presient/sensor1/breath_rate/state",
-                "presient/sensor1/sensor/presient_mr60bha2_sensor_breathing_rate/state"
-            ]
-            
-            for topic in topics:
+            for topic in TOPICS:
                 client.subscribe(topic)
                 logger.debug(f"📡 Subscribed to: {topic}")
         else:
@@ -54,46 +81,52 @@ class BiometricDataCollector:
         """MQTT message callback - compatible with paho-mqtt v2.0+"""
         if not self.is_collecting or not BiometricSample:
             return
+        handler = self._dispatch.get(message.topic)
+        if handler is None:
+            return
             
         try:
-            topic = message.topic
-            payload = message.payload.decode('utf-8')
-            
-            # Process heart rate data
-            if "heart_rate" in topic and "/state" in topic:
-                heart_rate = float(payload)
-                
-                # Validate heart rate (skip fallback values)
-                if 40 <= heart_rate <= 180 and heart_rate != 40.0:
-                    sample = BiometricSample(
-                        heart_rate=heart_rate,
-                        timestamp=datetime.now()
-                    )
-                    self.collected_samples.append(sample)
-                    print(f"💓 Sampled: {heart_rate} BPM (#{len(self.collected_samples)})")
-                    
-            # Process breathing rate data
-            elif ("breath_rate" in topic or "breathing_rate" in topic) and "/state" in topic:
-                try:
-                    breathing_rate = float(payload)
-                    # Add to most recent sample if it exists and doesn't have breathing rate
-                    if (self.collected_samples and 
-                        self.collected_samples[-1].breathing_rate is None and
-                        (datetime.now() - self.collected_samples[-1].timestamp).total_seconds() < 5):
-                        self.collected_samples[-1].breathing_rate = breathing_rate
-                        logger.debug(f"🫁 Added breathing: {breathing_rate:.1f} BPM")
-                except ValueError:
-                    pass
-                    
+            handler(message.payload)
         except Exception as e:
             print(f"⚠️ Failed to parse MQTT message: {e}")
 
+    def _on_heart_rate(self, payload):
+        """Process heart rate data"""
+        # float() parses the ASCII payload bytes directly, so there is no
+        # intermediate str to decode
+        heart_rate = float(payload)
+        
+        # Validate heart rate (skip fallback values)
+        if 40 <= heart_rate <= 180 and heart_rate != 40.0:
+            sample = BiometricSample(
+                heart_rate=heart_rate,
+                timestamp=datetime.now()
+            )
+            self.collected_samples.append(sample)
+            print(f"💓 Sampled: {heart_rate} BPM (#{len(self.collected_samples)})")
+            if len(self.collected_samples) % 10 == 0:
+                print(f"📊 Collected {len(self.collected_samples)} samples ({self._remaining_seconds():.0f}s remaining)")
+
+    def _on_breathing_rate(self, payload):
+        """Process breathing rate data"""
+        try:
+            breathing_rate = float(payload)
+        except ValueError:
+            return
+        # Add to most recent sample if it exists and doesn't have breathing rate
+        if (self.collected_samples and 
+            self.collected_samples[-1].breathing_rate is None and
+            (datetime.now() - self.collected_samples[-1].timestamp).total_seconds() < 5):
+            self.collected_samples[-1].breathing_rate = breathing_rate
+            logger.debug(f"🫁 Added breathing: {breathing_rate:.1f} BPM")
+
     def collect_enrollment_data(self, user_name: str) -> List[BiometricSample]:
         """Collect biometric data for user enrollment"""
         print(f"🧪 Collecting {self.collection_seconds} seconds of heart rate data for {user_name}...")
         print("📍 Please stay near your MR60BHA2 sensor...")
 
         self.collected_samples.clear()
+        self._done.clear()
         self.is_collecting = True
         self._start_time = datetime.now()
         
@@ -106,19 +139,15 @@ class BiometricDataCollector:
             self._client.connect(self.mqtt_host, self.mqtt_port, 60)
             self._client.loop_start()
 
-            # Collect for specified duration with progress updates
-            start_time = time.time()
-            while time.time() - start_time < self.collection_seconds:
-                remaining = self.collection_seconds - (time.time() - start_time)
-                if remaining > 0:
-                    if len(self.collected_samples) == 0:
-                        print(f"⏳ Waiting for sensor data... ({remaining:.0f}s remaining)")
-                    elif len(self.collected_samples) % 10 == 0 and len(self.collected_samples) > 0:
-                        print(f"📊 Collected {len(self.collected_samples)} samples ({remaining:.0f}s remaining)")
-                    time.sleep(1)
+            # Collect for specified duration; progress is reported as samples
+            # arrive, and by a timer only until the first one does
+            self._report_waiting()
+            self._done.wait(timeout=self.collection_seconds)
 
         finally:
             self.is_collecting = False
+            if self._waiting_timer:
+                self._waiting_timer.cancel()
             self._client.loop_stop()
             self._client.disconnect()
 
@@ -0,0 +1,57 @@
+"""Tests for the shared presient_debug HTTP client"""
+
+import aiohttp
+import pytest
+
+from presient_debug.client import Breaker, CircuitOpenError
+
+
+class FakeResponse:
+    def __init__(self, status):
+        self.status = status
+
+
+def replay(*outcomes):
+    """Build a GET stand-in that raises or returns each outcome in turn"""
+    outcomes = list(outcomes)
+
+    async def get(path):
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return outcome
+
+    return get
+
+
+@pytest.mark.asyncio
+async def test_breaker_releases_probe_after_unexpected_error():
+    """A non-connection error during the half-open probe must not wedge the breaker"""
+    breaker = Breaker(fail_max=1, reset_after=0)
+    get = replay(
+        aiohttp.ClientConnectionError("refused"),
+        aiohttp.ClientPayloadError("truncated body"),
+        FakeResponse(200),
+    )
+
+    with pytest.raises(aiohttp.ClientConnectionError):
+        await breaker(get, "/health")
+
+    # The half-open probe fails with an error the breaker does not count
+    with pytest.raises(aiohttp.ClientPayloadError):
+        await breaker(get, "/health")
+
+    # The next call is let through as a new probe instead of being skipped
+    response = await breaker(get, "/health")
+    assert response.status == 200
+
+
+@pytest.mark.asyncio
+async def test_breaker_skips_endpoint_while_open():
+    breaker = Breaker(fail_max=1, reset_after=60)
+    get = replay(aiohttp.ClientConnectionError("refused"))
+
+    with pytest.raises(aiohttp.ClientConnectionError):
+        await breaker(get, "/health")
+    with pytest.raises(CircuitOpenError):
+        await breaker(get, "/health")